@@ -1,6 +1,15 @@
 class DisplayConf:
     resolution = const((480, 320))
     rotation   = const(270)
+    max_fps    = const(30)
+
+class KittyConf:
+    glyph_cache_bytes = const(4096)
+    display_list = False
+    compositor = False
+    compositor_tile_width = const(120)
+    compositor_tile_height = const(16)
+    compositor_bytes = const(32768)
 
 class DriversConf:
     gpu = 'ILI9488'
@@ -11,4 +20,11 @@ class AppsConf:
     sd_directory = 'sd/apps'
     sys_directory = 'system_apps'
     home_app = 'vanilla'
-    status_bar_app = 'azuki'
\ No newline at end of file
+    status_bar_app = 'azuki'
+
+class DebugConf:
+    spi_trace = False
+    spi_trace_dump_ms = const(5000)
+    frame_stats = False
+    frame_stats_frames = const(32)
+    slow_frame_ms = const(50)
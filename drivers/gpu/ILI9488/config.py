@@ -6,4 +6,10 @@ class SpiConf:
     rst      = const(14)
     miso     = None
     baudrate = const(80_000_000)
-    number   = 0
\ No newline at end of file
+    number   = 0
+
+class TransferConf:
+    backend  = 'sync' # 'sync' or 'dma'
+    buffers  = const(2)
+    chunk_bytes = const(3072) # Largest transfer buffer, RAM for throughput
+    combine  = True # Merge windows continuing the previous one
@@ -1,8 +1,9 @@
 from time import sleep_ms
 from math import cos, sin, pi, radians
-import ustruct
 from machine import Pin, SPI
-from .config import SpiConf
+from .config import SpiConf, TransferConf
+from lib.system.transfer import TransferQueue, SyncBackend, DmaBackend, ChunkPlanner
+from lib.system import spi_trace
 
 class Gpu(object):
     """Serial interface for 18-bit color (6-6-6 RGB) IL9488 display.
@@ -64,7 +65,7 @@ class Gpu(object):
             rotation (Optional int): Rotation must be 0 default, 90. 180 or 270
         """
         
-        self.spi = SPI(SpiConf.number, baudrate=SpiConf.baudrate, mosi=Pin(SpiConf.mosi), sck=Pin(SpiConf.clk))
+        self.spi = spi_trace.wrap(SPI(SpiConf.number, baudrate=SpiConf.baudrate, mosi=Pin(SpiConf.mosi), sck=Pin(SpiConf.clk)), 'gpu')
         
         self.cs = Pin(SpiConf.cs)
         self.dc = Pin(SpiConf.dc)
@@ -75,11 +76,39 @@ class Gpu(object):
         self.dc.init(self.dc.OUT, value=0)
         self.rst.init(self.rst.OUT, value=1)
         
+        # Preallocated command buffers of the block fast path
+        self.cmd_buf = bytearray(1)
+        self.column_buf = bytearray(4)
+        self.page_buf = bytearray(4)
+        self.selected = False
+        self.combine = TransferConf.combine
+        self.forget_window()
+        
+        if TransferConf.backend == 'dma':
+            backend = DmaBackend(self.spi, SpiConf.number)
+        else:
+            backend = SyncBackend(self.spi)
+        
+        # Shared with Kitty, so one setting sizes every transfer buffer
+        self.planner = ChunkPlanner(TransferConf.chunk_bytes)
+        self.queue = TransferQueue(backend, TransferConf.buffers, self.planner.buffer_size(TransferConf.buffers, self.width * 3))
+        self.reset_stats()
+        
         if rotation not in self.ROTATIONS.keys():
             raise RuntimeError('Rotation must be 0, 90, 180 or 270.')
         else:
             self.rotation = self.ROTATIONS[rotation]
         
+        # Hardware scrolling follows the panel's 480 line axis, which is X
+        # when rows and columns are exchanged (MV) and reversed with MY
+        self.scroll_x = bool(self.rotation & 0x20)
+        self.scroll_reversed = bool(self.rotation & 0x80)
+        self.scroll_top = 0
+        self.scroll_lines = self.width if self.scroll_x else self.height
+        self.scroll_offset = 0
+        self.split = None
+        self.split_cursor = 0
+        
         self.reset()
         
         # Send initialization commands
@@ -114,45 +143,217 @@ class Gpu(object):
             y1 (int):  Ending Y position.
             data (bytes): Data buffer to write.
         """
-        self.write_cmd(self.SET_COLUMN, *ustruct.pack(">HH", x0, x1))
-        self.write_cmd(self.SET_PAGE, *ustruct.pack(">HH", y0, y1))
+        self.window(x0, y0, x1, y1)
+        self.write_data(data)
+    
+    @micropython.native
+    def window(self, x0, y0, x1, y1):
+        """Set the address window and start a memory write.
 
-        self.write_cmd(self.WRITE_RAM)
+        Args:
+            x0 (int):  Starting X position.
+            y0 (int):  Starting Y position.
+            x1 (int):  Ending X position.
+            y1 (int):  Ending Y position.
+        Note:
+            Pixel data for the window can then be streamed in any number
+            of write_data calls, row by row from the top left corner.
+            Coordinates are screen positions, windows in a scrolled area
+            are moved to the memory lines currently shown there.
+            When combining, a window with the same columns starting right
+            below a completely written one continues its memory write.
+        """
+        self.split = None
         
-        self.write_data(data)
+        if self.combine and not self.scroll_offset:
+            if self.open_remaining == 0 and y0 == self.open_y1 + 1 and x0 == self.open_x0 and x1 == self.open_x1:
+                # Memory write carries on into the rows below
+                self.open_y1 = y1
+                self.open_remaining = (x1 - x0 + 1) * (y1 - y0 + 1) * 3
+                self.combined_windows += 1
+                return
+            
+            # Page range left open to the bottom so a next window can follow
+            self.address_window(x0, y0, x1, self.height - 1)
+            self.open_x0 = x0
+            self.open_x1 = x1
+            self.open_y1 = y1
+            self.open_remaining = (x1 - x0 + 1) * (y1 - y0 + 1) * 3
+            return
+        
+        self.open_y1 = -2
+        
+        if self.scroll_offset:
+            if self.scroll_x:
+                l0 = x0
+                l1 = x1
+            else:
+                l0 = y0
+                l1 = y1
+            
+            if self.scroll_run(l0, l1 - l0 + 1) <= l1 - l0:
+                # Wraps or leaves the scroll area, written line by line
+                self.split = (x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+                self.split_cursor = 0
+                self.split_windows += 1
+                return
+            
+            a0 = self.scroll_address(l0)
+            
+            if self.scroll_x:
+                x0 = a0
+                x1 = a0 + l1 - l0
+            else:
+                y0 = a0
+                y1 = a0 + l1 - l0
+        
+        self.address_window(x0, y0, x1, y1)
+    
+    @micropython.native
+    def address_window(self, x0, y0, x1, y1):
+        """Set the memory address window and start a memory write.
+
+        Note:
+            Column and page ranges equal to the previous window are not
+            sent again, and CS stays asserted until another command.
+            Waits for queued transfers first.
+        """
+        spi = self.spi
+        cmd = self.cmd_buf
+        
+        # Queued pixel data must leave before DC drops for the commands
+        self.queue.wait()
+        
+        if not self.selected:
+            self.cs(0)
+            self.selected = True
+        
+        if x0 != self.window_x0 or x1 != self.window_x1:
+            buf = self.column_buf
+            buf[0] = x0 >> 8
+            buf[1] = x0 & 0xFF
+            buf[2] = x1 >> 8
+            buf[3] = x1 & 0xFF
+            cmd[0] = self.SET_COLUMN
+            self.dc(0)
+            spi.write(cmd)
+            self.dc(1)
+            spi.write(buf)
+            self.window_x0 = x0
+            self.window_x1 = x1
+            self.cmd_bytes += 5
+        else:
+            self.skipped_addresses += 1
+        
+        if y0 != self.window_y0 or y1 != self.window_y1:
+            buf = self.page_buf
+            buf[0] = y0 >> 8
+            buf[1] = y0 & 0xFF
+            buf[2] = y1 >> 8
+            buf[3] = y1 & 0xFF
+            cmd[0] = self.SET_PAGE
+            self.dc(0)
+            spi.write(cmd)
+            self.dc(1)
+            spi.write(buf)
+            self.window_y0 = y0
+            self.window_y1 = y1
+            self.cmd_bytes += 5
+        else:
+            self.skipped_addresses += 1
+        
+        cmd[0] = self.WRITE_RAM
+        self.dc(0)
+        spi.write(cmd)
+        self.dc(1)
+        self.cmd_bytes += 1
+        self.windows += 1
+    
+    def forget_window(self):
+        """Force the next window to send its column and page ranges."""
+        self.window_x0 = -1
+        self.window_x1 = -1
+        self.window_y0 = -1
+        self.window_y1 = -1
+        self.open_x0 = -1
+        self.open_x1 = -1
+        self.open_y1 = -2
+        self.open_remaining = -1
+    
+    def flush(self):
+        """End the frame, sending queued data and closing the combined window."""
+        self.queue.wait()
+        self.open_y1 = -2
+    
+    def reset_stats(self):
+        """Reset the bus traffic counters."""
+        self.cmd_bytes = 0
+        self.data_bytes = 0
+        self.windows = 0
+        self.skipped_addresses = 0
+        self.split_windows = 0
+        self.combined_windows = 0
+        self.queue.submitted = 0
+        self.queue.waits = 0
+    
+    def stats(self):
+        """Return bytes sent as commands and as data since the last reset."""
+        return {'cmd_bytes': self.cmd_bytes,
+                'data_bytes': self.data_bytes,
+                'queued_bytes': self.queue.submitted,
+                'queue_waits': self.queue.waits,
+                'windows': self.windows,
+                'skipped_addresses': self.skipped_addresses,
+                'split_windows': self.split_windows,
+                'combined_windows': self.combined_windows}
 
     def cleanup(self):
         """Clean up resources."""
         self.clear()
+        self.wait()
         self.display_off()
         self.spi.deinit()
         print('display off')
 
-    def clear(self, color=0, hlines=8):
+    def clear(self, color=0, hlines=None, planner=None):
         """Clear display.
 
         Args:
             color (Optional int): RGB888 color value (Default: 0 = Black).
-            hlines (Optional int): # of horizontal lines per chunk (Default: 8)
+            hlines (Optional int): # of horizontal lines per chunk (Default: planned)
+            planner (Optional ChunkPlanner): Planner sizing the chunks (Default: own).
         Note:
-            hlines was introduced to deal with memory allocation on some
-            boards.  Smaller values allocate less memory but take longer
-            to execute.  hlines must be a factor of the display height.
-            For example, for a 240 pixel height, valid values for hline
-            would be 1, 2, 4, 5, 8, 10, 16, 20, 32, 40, 64, 80, 160.
-            Higher values may result in memory allocation errors.
+            Without hlines, chunks are as large as the planner allows for
+            the free heap. The buffer is halved when it cannot be
+            allocated, down to a single line.
         """
 
         w = self.width
         h = self.height
-        assert hlines > 0 and h % hlines == 0, ("hlines must be a non-zero factor of height.")
-        # Clear display
+        row_bytes = w * 3
+        planner = planner or self.planner
+        
+        if hlines == None:
+            hlines = planner.rows(row_bytes, h, planner.buffer_size(1, row_bytes, True))
+        
+        assert hlines > 0, ("hlines must be positive.")
+        line = memoryview(planner.allocate(min(hlines, h) * row_bytes, row_bytes))
+        hlines = planner.rows(row_bytes, h, len(line))
+        
         if color:
-            line = color.to_bytes(3, 'big') * (w * hlines)
-        else:
-            line = bytearray(w * 3 * hlines)
+            pattern = color.to_bytes(3, 'big')
+            line[0:3] = pattern
+            filled = 3
+            
+            while filled < len(line):
+                n = min(filled, len(line) - filled)
+                line[filled:filled + n] = line[:n]
+                filled += n
+        
+        # Clear display
         for y in range(0, h, hlines):
-            self.block(0, y, w - 1, y + hlines - 1, line)
+            n = min(hlines, h - y)
+            self.block(0, y, w - 1, y + n - 1, line[:n * row_bytes])
             
     def display_off(self):
         """Turn display off."""
@@ -164,6 +365,7 @@ class Gpu(object):
         
     def reset(self):
         """Perform reset: Low=initialization, High=normal operation."""
+        self.forget_window()
         self.rst(0)
         sleep_ms(50)
         self.rst(1)
@@ -176,13 +378,21 @@ class Gpu(object):
             command (byte): ILI9488 command code.
             *args (optional bytes): Data to transmit.
         """
+        self.queue.wait()
         self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([command]))
-        self.cs(1)
+        self.cmd_buf[0] = command
+        self.spi.write(self.cmd_buf)
+        self.cmd_bytes += 1
         # Handle any passed data
         if len(args) > 0:
-            self.write_data(bytearray(args))
+            self.dc(1)
+            self.spi.write(bytearray(args))
+            self.cmd_bytes += len(args)
+        self.cs(1)
+        self.selected = False
+        # Commands may change the address window
+        self.forget_window()
     
     def write_data(self, data):
         """Write data to TFT.
@@ -190,8 +400,164 @@ class Gpu(object):
         Args:
             data (bytes): Data to transmit.
         """
-        self.dc(1)
-        self.cs(0)
+        if self.split != None:
+            self.write_split(data)
+            return
+        
+        if not self.selected:
+            self.dc(1)
+            self.cs(0)
+            self.selected = True
+        
+        # Keep the order of the bytes with queued transfers
+        self.queue.wait()
         self.spi.write(data)
-        self.cs(1)
-    
\ No newline at end of file
+        self.data_bytes += len(data)
+        self.open_remaining -= len(data)
+    
+    def acquire(self):
+        """Return a transfer buffer to fill with pixel data.
+
+        Returns:
+            memoryview: Buffer to pass, or a slice of it, to submit().
+        Note:
+            Buffers rotate, so the one returned is not being sent while
+            it is filled. Only fill the latest acquired buffer.
+        """
+        return self.queue.acquire()
+    
+    def submit(self, data):
+        """Queue data of an acquired buffer, continuing the current window.
+
+        Args:
+            data (memoryview): Acquired buffer, or a slice of it.
+        Note:
+            Returns as soon as the transfer starts when the backend is
+            asynchronous, so the caller can fill the next buffer meanwhile.
+        """
+        if self.split != None:
+            self.write_split(data)
+            return
+        
+        if not self.selected:
+            self.dc(1)
+            self.cs(0)
+            self.selected = True
+        
+        self.queue.submit(data)
+        self.data_bytes += len(data)
+        self.open_remaining -= len(data)
+    
+    def wait(self):
+        """Block until every queued transfer is sent."""
+        self.queue.wait()
+    
+    def set_scroll_area(self, top, bottom):
+        """Define the hardware scroll area and reset its offset.
+
+        Args:
+            top (int): Fixed lines before the scroll area.
+            bottom (int): Fixed lines after the scroll area.
+        Note:
+            The panel only scrolls along its 480 line axis, which is the
+            X axis in landscape rotations, see scroll_x. Lines are screen
+            positions along that axis.
+        """
+        count = self.width if self.scroll_x else self.height
+        lines = count - top - bottom
+        
+        if top < 0 or bottom < 0 or lines <= 0:
+            raise ValueError('Scroll area must leave at least one line.')
+        
+        self.scroll_top = top
+        self.scroll_lines = lines
+        self.scroll_offset = 0
+        
+        if self.scroll_reversed:
+            top, bottom = bottom, top
+        
+        self.write_cmd(self.VSCRDEF, top >> 8, top & 0xFF, lines >> 8, lines & 0xFF, bottom >> 8, bottom & 0xFF)
+        self.write_cmd(self.VSCRSADD, top >> 8, top & 0xFF)
+    
+    def scroll(self, lines):
+        """Scroll the content of the scroll area.
+
+        Args:
+            lines (int): Lines to move the content towards the start of the
+                axis, negative values move it towards the end.
+        Note:
+            Only the start address changes, the lines that come into view
+            still hold old content and must be drawn again.
+        """
+        self.scroll_offset = (self.scroll_offset + lines) % self.scroll_lines
+        offset = self.scroll_offset
+        start = self.scroll_top
+        
+        if self.scroll_reversed:
+            # Area starts after the bottom fixed lines and runs backwards
+            count = self.width if self.scroll_x else self.height
+            start = count - self.scroll_top - self.scroll_lines
+            offset = (self.scroll_lines - offset) % self.scroll_lines
+        
+        start += offset
+        self.write_cmd(self.VSCRSADD, start >> 8, start & 0xFF)
+    
+    def scroll_address(self, line):
+        """Return the address showing at screen line along the scroll axis."""
+        top = self.scroll_top
+        
+        if line < top or line >= top + self.scroll_lines:
+            return line
+        
+        return top + (line - top + self.scroll_offset) % self.scroll_lines
+    
+    def scroll_run(self, line, count):
+        """Return how many of count lines from line have contiguous addresses."""
+        top = self.scroll_top
+        end = top + self.scroll_lines
+        
+        if line < top:
+            return min(count, top - line)
+        
+        if line >= end:
+            return count
+        
+        wrap = self.scroll_lines - (line - top + self.scroll_offset) % self.scroll_lines
+        return min(count, wrap, end - line)
+    
+    def write_split(self, data):
+        """Write data of a window split by the scroll wrap, row by row."""
+        view = memoryview(data)
+        x0, y0, width, height = self.split
+        size = width * height
+        pixels = len(data) // 3
+        offset = 0
+        
+        while offset < pixels:
+            cursor = self.split_cursor % size
+            row, column = divmod(cursor, width)
+            count = min(width - column, pixels - offset)
+            
+            self.write_split_row(x0 + column, y0 + row, view[offset * 3:(offset + count) * 3], count)
+            
+            offset += count
+            self.split_cursor = cursor + count
+    
+    def write_split_row(self, x, y, data, count):
+        """Write count pixels of one screen row at their scrolled addresses."""
+        if not self.scroll_x:
+            a = self.scroll_address(y)
+            self.address_window(x, a, x + count - 1, a)
+            self.spi.write(data)
+            self.data_bytes += len(data)
+            return
+        
+        start = 0
+        
+        while start < count:
+            n = self.scroll_run(x + start, count - start)
+            a = self.scroll_address(x + start)
+            self.address_window(a, y, a + n - 1, y)
+            self.spi.write(data[start * 3:(start + n) * 3])
+            self.data_bytes += n * 3
+            start += n
@@ -0,0 +1,9 @@
+class FramebufferConf:
+    baudrate     = const(80_000_000) # Modelled SPI clock
+    command_us   = const(2)          # CS/DC toggling and call overhead per command
+    log_limit    = const(4096)       # Transactions kept, 0 disables the log
+    chunk_bytes  = const(3072)       # Largest transfer buffer, as the panel drivers
+    combine      = True              # Merge windows continuing the previous one, as the panel drivers
+    backend      = 'sync'            # 'sync', or 'thread' to store queued data from a worker thread
+    buffers      = const(2)          # Transfer buffers of the queue
+    simulate_bus = False             # Writes take as long as the modelled bus, to measure overlap
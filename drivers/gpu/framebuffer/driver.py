@@ -0,0 +1,363 @@
+import struct
+from .config import FramebufferConf
+from lib.system.transfer import TransferQueue, SyncBackend, ThreadBackend, SimulatedSpi, ChunkPlanner
+
+class PixelBus:
+    def __init__(self, gpu):
+        """Bus end of the framebuffer, what reaches it is stored at once.
+
+        Args:
+            gpu (Gpu): Framebuffer display storing the pixel data.
+        """
+        self.gpu = gpu
+
+    def write(self, data):
+        self.gpu.store(data)
+
+class Gpu(object):
+    """Headless display drawing into an in-memory RGB888 framebuffer.
+
+    Note:  All coordinates are zero based. Traffic is counted as the
+    ILI9488 driver would send it, so bus costs can be measured without
+    the panel. Pixel data goes through a transfer queue as on the panel.
+    The thread backend stores queued data from a worker thread, over a
+    simulated bus when asked, so queue ordering and overlap can be
+    checked on the host.
+    """
+
+    SET_COLUMN = const(0x2A)  # Column address set
+    SET_PAGE = const(0x2B)  # Page address set
+    WRITE_RAM = const(0x2C)  # Memory write
+    DISPLAY_OFF = const(0x28)  # Display off
+    DISPLAY_ON = const(0x29)  # Display on
+
+    def __init__(self, resolution, rotation = 0, backend = None, simulate_bus = None):
+        """Initialize Driver.
+        Args:
+            resolution (tupple): Tupple containing the resolution (width, height)
+            rotation (Optional int): Kept for interface parity, 0, 90, 180 or 270
+            backend (Optional str): 'sync' or 'thread' (Default: FramebufferConf.backend)
+            simulate_bus (Optional bool): Writes take the modelled bus time
+                (Default: FramebufferConf.simulate_bus)
+        """
+
+        if rotation not in (0, 90, 180, 270):
+            raise RuntimeError('Rotation must be 0, 90, 180 or 270.')
+
+        self.width = resolution[0]
+        self.height = resolution[1]
+        self.rotation = rotation
+        self.buffer = bytearray(self.width * self.height * 3)
+        self.on = True
+
+        self.baudrate = FramebufferConf.baudrate
+        self.command_us = FramebufferConf.command_us
+        self.log_limit = FramebufferConf.log_limit
+        self.combine = FramebufferConf.combine
+        self.planner = ChunkPlanner(FramebufferConf.chunk_bytes)
+
+        if backend == None:
+            backend = FramebufferConf.backend
+
+        if simulate_bus == None:
+            simulate_bus = FramebufferConf.simulate_bus
+
+        self.bus = PixelBus(self)
+
+        if simulate_bus:
+            self.bus = SimulatedSpi(self.baudrate, self.bus)
+
+        if backend == 'thread':
+            transfer = ThreadBackend(self.bus)
+        else:
+            transfer = SyncBackend(self.bus)
+
+        self.queue = TransferQueue(transfer, FramebufferConf.buffers, self.planner.buffer_size(FramebufferConf.buffers, self.width * 3))
+
+        self.window_x0 = 0
+        self.window_y0 = 0
+        self.window_width = 1
+        self.window_height = 1
+        self.cursor = 0
+        self.forget_window()
+        self.reset_stats()
+
+    def block(self, x0, y0, x1, y1, data):
+        """Write a block of data to the framebuffer.
+
+        Args:
+            x0 (int):  Starting X position.
+            y0 (int):  Starting Y position.
+            x1 (int):  Ending X position.
+            y1 (int):  Ending Y position.
+            data (bytes): Data buffer to write.
+        """
+        self.window(x0, y0, x1, y1)
+        self.write_data(data)
+
+    def window(self, x0, y0, x1, y1):
+        """Set the address window of the following write_data calls.
+
+        Note:
+            Costs the same commands as the ILI9488 driver, column and page
+            ranges equal to the previous window are not counted again, and
+            when combining, a window continuing a completely written one
+            with the same columns costs nothing. Waits for queued
+            transfers first.
+        """
+        # Queued pixel data belongs to the previous window
+        self.queue.wait()
+
+        if self.combine and self.open_remaining == 0 and y0 == self.open_y1 + 1 and x0 == self.window_x0 and x1 == self.window_x0 + self.window_width - 1:
+            self.open_y1 = y1
+            self.open_remaining = (x1 - x0 + 1) * (y1 - y0 + 1) * 3
+            self.window_height += y1 - y0 + 1
+            self.combined_windows += 1
+            self.record('combined', x0, y0, x1, y1)
+            return
+
+        if x0 != self.last_x0 or x1 != self.last_x1:
+            self.command(self.SET_COLUMN, 4)
+            self.last_x0 = x0
+            self.last_x1 = x1
+        else:
+            self.skipped_addresses += 1
+
+        # Combining leaves the page range open to the bottom
+        page_end = self.height - 1 if self.combine else y1
+
+        if y0 != self.last_y0 or page_end != self.last_y1:
+            self.command(self.SET_PAGE, 4)
+            self.last_y0 = y0
+            self.last_y1 = page_end
+        else:
+            self.skipped_addresses += 1
+
+        self.command(self.WRITE_RAM, 0)
+        self.windows += 1
+        self.record('window', x0, y0, x1, y1)
+
+        self.window_x0 = x0
+        self.window_y0 = y0
+        self.window_width = x1 - x0 + 1
+        self.window_height = y1 - y0 + 1
+        self.cursor = 0
+        self.open_y1 = y1
+        self.open_remaining = self.window_width * self.window_height * 3
+
+    def write_data(self, data):
+        """Write pixel data at the current window position.
+
+        Args:
+            data (bytes): RGB888 data, continuing the current window.
+        """
+        # Keep the order of the bytes with queued transfers
+        self.queue.wait()
+        self.bus.write(data)
+        self.count_data(data)
+
+    def acquire(self):
+        """Return a transfer buffer to fill with pixel data.
+
+        Returns:
+            memoryview: Buffer to pass, or a slice of it, to submit().
+        Note:
+            Buffers rotate, so the one returned is not being sent while
+            it is filled. Only fill the latest acquired buffer.
+        """
+        return self.queue.acquire()
+
+    def submit(self, data):
+        """Queue data of an acquired buffer, continuing the current window.
+
+        Args:
+            data (memoryview): Acquired buffer, or a slice of it.
+        Note:
+            Returns as soon as the transfer starts with the thread
+            backend, so the caller can fill the next buffer meanwhile.
+        """
+        self.queue.submit(data)
+        self.count_data(data)
+
+    def wait(self):
+        """Block until every queued transfer is stored."""
+        self.queue.wait()
+
+    def count_data(self, data):
+        self.data_bytes += len(data)
+        self.open_remaining -= len(data)
+        self.data_writes += 1
+        self.record('data', len(data))
+
+    def store(self, data):
+        """Store pixel data at the cursor of the current window, as the panel does."""
+        view = memoryview(data)
+        pixels = len(data) // 3
+        window_width = self.window_width
+        window_size = window_width * self.window_height
+        buffer = self.buffer
+        width = self.width
+        offset = 0
+
+        while offset < pixels:
+            cursor = self.cursor % window_size
+            row, column = divmod(cursor, window_width)
+            count = min(window_width - column, pixels - offset)
+            x = self.window_x0 + column
+            y = self.window_y0 + row
+
+            # The panel ignores writes outside its memory
+            start = max(x, 0)
+            end = min(x + count, width)
+
+            if 0 <= y < self.height and start < end:
+                o = (y * width + start) * 3
+                i = (offset + start - x) * 3
+                buffer[o:o + (end - start) * 3] = view[i:i + (end - start) * 3]
+
+            offset += count
+            self.cursor = cursor + count
+
+    def write_cmd(self, command, *args):
+        """Count a command and its arguments.
+
+        Args:
+            command (byte): ILI9488 command code.
+            *args (optional bytes): Data to transmit.
+        """
+        self.queue.wait()
+        self.command(command, len(args))
+        self.forget_window()
+
+    def command(self, command, arg_bytes):
+        self.cmd_bytes += 1 + arg_bytes
+        self.commands += 1
+        self.record('cmd', command, arg_bytes)
+
+    def record(self, *transaction):
+        if len(self.log) < self.log_limit:
+            self.log.append(transaction)
+        else:
+            self.log_dropped += 1
+
+    def forget_window(self):
+        """Count the column and page ranges again on the next window."""
+        self.last_x0 = -1
+        self.last_x1 = -1
+        self.last_y0 = -1
+        self.last_y1 = -1
+        self.open_y1 = -2
+        self.open_remaining = -1
+
+    def flush(self):
+        """End the frame, storing queued data and closing the combined window."""
+        self.queue.wait()
+        self.open_y1 = -2
+
+    def reset_stats(self):
+        """Reset the traffic counters and the transaction log."""
+        self.cmd_bytes = 0
+        self.data_bytes = 0
+        self.commands = 0
+        self.windows = 0
+        self.data_writes = 0
+        self.skipped_addresses = 0
+        self.combined_windows = 0
+        self.log = []
+        self.log_dropped = 0
+        self.queue.submitted = 0
+        self.queue.waits = 0
+
+    def bus_us(self):
+        """Return the modelled bus time of the traffic since the last reset."""
+        bits = (self.cmd_bytes + self.data_bytes) * 8
+        return bits * 1_000_000 // self.baudrate + self.commands * self.command_us
+
+    def stats(self):
+        """Return bytes sent as commands and as data since the last reset."""
+        return {'cmd_bytes': self.cmd_bytes,
+                'data_bytes': self.data_bytes,
+                'commands': self.commands,
+                'windows': self.windows,
+                'data_writes': self.data_writes,
+                'queued_bytes': self.queue.submitted,
+                'queue_waits': self.queue.waits,
+                'skipped_addresses': self.skipped_addresses,
+                'combined_windows': self.combined_windows,
+                'bus_us': self.bus_us()}
+
+    def cleanup(self):
+        """Clean up resources."""
+        self.clear()
+        self.display_off()
+
+    def clear(self, color=0, hlines=None, planner=None):
+        """Clear display.
+
+        Args:
+            color (Optional int): RGB888 color value (Default: 0 = Black).
+            hlines (Optional int): # of horizontal lines per chunk (Default: planned)
+            planner (Optional ChunkPlanner): Planner sizing the chunks (Default: own).
+        """
+        w = self.width
+        h = self.height
+        row_bytes = w * 3
+        planner = planner or self.planner
+
+        if hlines == None:
+            hlines = planner.rows(row_bytes, h, planner.buffer_size(1, row_bytes, True))
+
+        line = color.to_bytes(3, 'big') * (w * min(hlines, h))
+
+        for y in range(0, h, hlines):
+            n = min(hlines, h - y)
+            self.block(0, y, w - 1, y + n - 1, memoryview(line)[:n * row_bytes])
+
+    def display_off(self):
+        """Turn display off."""
+        self.write_cmd(self.DISPLAY_OFF)
+        self.on = False
+
+    def display_on(self):
+        """Turn display on."""
+        self.write_cmd(self.DISPLAY_ON)
+        self.on = True
+
+    def pixel(self, x, y):
+        """Return the RGB888 color of a pixel."""
+        self.queue.wait()
+        o = (y * self.width + x) * 3
+        return (self.buffer[o] << 16) | (self.buffer[o + 1] << 8) | self.buffer[o + 2]
+
+    def dump_ppm(self, path):
+        """Write the framebuffer to a binary PPM (P6) image."""
+        self.queue.wait()
+        with open(path, 'wb') as f:
+            f.write('P6\n{0} {1}\n255\n'.format(self.width, self.height).encode())
+            f.write(self.buffer)
+
+    def dump_png(self, path):
+        """Write the framebuffer to a PNG image, needs zlib."""
+        import zlib
+
+        self.queue.wait()
+
+        row_bytes = self.width * 3
+        raw = bytearray()
+
+        for y in range(self.height):
+            # Filter type 0, raw scanline
+            raw.append(0)
+            raw.extend(self.buffer[y * row_bytes:(y + 1) * row_bytes])
+
+        def chunk(f, kind, data):
+            f.write(struct.pack('>I', len(data)))
+            f.write(kind)
+            f.write(data)
+            f.write(struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+        with open(path, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n')
+            chunk(f, b'IHDR', struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0))
+            chunk(f, b'IDAT', zlib.compress(bytes(raw)))
+            chunk(f, b'IEND', b'')
@@ -1,15 +1,18 @@
 from machine import Pin, SPI
 from .config import SpiConf
-from .sdcard import SDCard
+from . import sdcard
+from lib.system.spi_trace import wrap, traced
 import uos
 
 class SDCard():
     def __init__(self, mount_point):
-        self.spi = SPI(SpiConf.number, baudrate=SpiConf.baudrate, mosi=Pin(SpiConf.mosi), sck=Pin(SpiConf.clk))
+        self.spi = wrap(SPI(SpiConf.number, baudrate=SpiConf.baudrate, mosi=Pin(SpiConf.mosi), sck=Pin(SpiConf.clk)), 'sdcard')
         self.cs = self.cs = Pin(SpiConf.cs)
 
         # Initialize SD card
         sd = sdcard.SDCard(self.spi, self.cs)
+        sd.readblocks = traced('SDCard.readblocks')(sd.readblocks)
+        sd.writeblocks = traced('SDCard.writeblocks')(sd.writeblocks)
 
         # Mount filesystem
         vfs = uos.VfsFat(sd)
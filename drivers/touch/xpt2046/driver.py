@@ -2,6 +2,7 @@
 from time import sleep
 from .config import SpiConf
 from machine import SoftSPI, Pin
+from lib.system.spi_trace import wrap, traced
 
 
 class Touch(object):
@@ -32,7 +33,7 @@ class Touch(object):
             y_min (int): Minimum Y coordinate
             y_max (int): Maximum Y coordinate
         """
-        self.spi = SoftSPI(sck=Pin(SpiConf.clk), mosi=Pin(SpiConf.mosi), miso=Pin(SpiConf.miso))
+        self.spi = wrap(SoftSPI(sck=Pin(SpiConf.clk), mosi=Pin(SpiConf.mosi), miso=Pin(SpiConf.miso)), 'touch')
         
         self.cs = Pin(SpiConf.cs)
         self.cs.init(self.cs.OUT, value=1)
@@ -111,6 +112,7 @@ class Touch(object):
         y = self.height - int(self.y_multiplier * y + self.y_add)
         return x, y
 
+    @traced('Touch.raw_touch')
     def raw_touch(self):
         """Read raw X,Y touch values.
 
@@ -0,0 +1,130 @@
+class Clip:
+    def __init__(self, gpu):
+        """Clipping layer in front of a display driver or compositor.
+
+        Args:
+            gpu (Gpu | Compositor): Target the visible pixels are written to.
+        Note:
+            The clip exposes the same block, window and write_data
+            interface as the display drivers, so Kitty draws through it
+            unchanged. Only pixels inside the clip rectangle reach the
+            target. A window is cropped to the rectangle and its visible
+            rows are sent to one target window, so clipping never adds
+            windows. Blocks inside the rectangle are passed through.
+        """
+
+        self.gpu = gpu
+        self.width = gpu.width
+        self.height = gpu.height
+        self.scratch = None
+        self.set(0, 0, gpu.width, gpu.height)
+
+        self.window_width = 1
+        self.visible = False
+        self.cursor = 0
+        self.first_row = 0
+        self.last_row = 0
+        self.crop_left = 0
+        self.crop_width = 0
+
+    def set(self, x, y, width, height):
+        """Only let pixels inside the rectangle through."""
+
+        self.x0 = x
+        self.y0 = y
+        self.x1 = x + width - 1
+        self.y1 = y + height - 1
+
+    def contains(self, x0, y0, x1, y1):
+        return x0 >= self.x0 and y0 >= self.y0 and x1 <= self.x1 and y1 <= self.y1
+
+    def block(self, x0, y0, x1, y1, data):
+        """Write the visible part of a block of data.
+
+        Args:
+            x0 (int):  Starting X position.
+            y0 (int):  Starting Y position.
+            x1 (int):  Ending X position.
+            y1 (int):  Ending Y position.
+            data (bytes): Data buffer to write.
+        """
+        if self.contains(x0, y0, x1, y1):
+            self.gpu.block(x0, y0, x1, y1, data)
+            return
+
+        self.window(x0, y0, x1, y1)
+        self.write_data(data)
+
+    def window(self, x0, y0, x1, y1):
+        """Set the address window of the following write_data calls."""
+
+        left = max(x0, self.x0)
+        right = min(x1, self.x1)
+        top = max(y0, self.y0)
+        bottom = min(y1, self.y1)
+
+        self.window_width = x1 - x0 + 1
+        self.cursor = 0
+        self.visible = left <= right and top <= bottom
+
+        if self.visible:
+            self.first_row = top - y0
+            self.last_row = bottom - y0
+            self.crop_left = left - x0
+            self.crop_width = right - left + 1
+            self.gpu.window(left, top, right, bottom)
+
+    def buffer(self, nbytes):
+        if self.scratch == None or len(self.scratch) < nbytes:
+            self.scratch = memoryview(bytearray(nbytes))
+
+        return self.scratch
+
+    @micropython.native
+    def write_data(self, data):
+        """Write the visible pixels of data, continuing the current window.
+
+        Args:
+            data (bytes): RGB888 data, continuing the current window.
+        """
+        cursor = self.cursor
+        end = cursor + len(data) // 3
+        self.cursor = end
+
+        if not self.visible or end == cursor:
+            return
+
+        width = self.window_width
+        row = max(self.first_row, cursor // width)
+        last = min(self.last_row, (end - 1) // width)
+
+        if row > last:
+            return
+
+        view = memoryview(data)
+
+        # Uncropped rows are contiguous, send them as they are
+        if self.crop_width == width:
+            start = max(cursor, row * width)
+            stop = min(end, (last + 1) * width)
+            self.gpu.write_data(view[(start - cursor) * 3:(stop - cursor) * 3])
+            return
+
+        left = self.crop_left
+        right = left + self.crop_width
+        scratch = self.buffer(len(data))
+        n = 0
+
+        while row <= last:
+            start = max(cursor, row * width + left)
+            stop = min(end, row * width + right)
+
+            if start < stop:
+                size = (stop - start) * 3
+                scratch[n:n + size] = view[(start - cursor) * 3:(stop - cursor) * 3]
+                n += size
+
+            row += 1
+
+        if n:
+            self.gpu.write_data(scratch[:n])
@@ -0,0 +1,270 @@
+from collections import OrderedDict
+
+class Tile:
+    def __init__(self, width, height):
+        """Off-screen tile.
+
+        Args:
+            width (int): Tile width in pixels.
+            height (int): Tile height in pixels.
+        """
+
+        self.buffer = bytearray(width * height * 3)
+        self.mask = bytearray(width * height)
+        self.view = memoryview(self.buffer)
+        self.x = 0
+        self.y = 0
+        self.width = width
+        self.height = height
+
+class Compositor:
+    FILLED = const(1)
+
+    def __init__(self, gpu, tile_width = 120, tile_height = 16, budget = 32768):
+        """Tiled off-screen framebuffer with dirty-tile flush.
+
+        Args:
+            gpu (Gpu): Display driver the tiles are flushed to.
+            tile_width (Optional int): Tile width (Default: 120).
+            tile_height (Optional int): Tile height (Default: 16).
+            budget (Optional int): Bytes of RAM used by tiles (Default: 32768).
+        Note:
+            The compositor exposes the same block, window and write_data
+            interface as the display drivers, so Kitty draws into it as if
+            it was the panel. Tiles are only allocated for areas written in
+            the current frame and are flushed when the frame ends, so each
+            pixel crosses the bus once per frame however many primitives
+            overlap it. When all tiles are in use the oldest one is flushed
+            early to make room. Only pixels written to a tile are flushed,
+            the rest of the panel is left untouched. Wide tiles suit the
+            row by row chunks Kitty writes.
+        """
+
+        self.gpu = gpu
+        self.width = gpu.width
+        self.height = gpu.height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = (self.width + tile_width - 1) // tile_width
+        self.max_tiles = max(1, budget // (tile_width * tile_height * 4))
+
+        self.tiles = OrderedDict()
+        self.free = []
+        self.allocated = 0
+        self.full_row = bytes([self.FILLED]) * tile_width
+        self.empty_mask = bytes(tile_width * tile_height)
+
+        self.window_x0 = 0
+        self.window_y0 = 0
+        self.window_width = 1
+        self.window_height = 1
+        self.cursor = 0
+
+        self.flushed_tiles = 0
+        self.early_flushes = 0
+        self.flushed_pixels = 0
+        self.flushed_windows = 0
+
+    def block(self, x0, y0, x1, y1, data):
+        """Write a block of data to the tiles.
+
+        Args:
+            x0 (int):  Starting X position.
+            y0 (int):  Starting Y position.
+            x1 (int):  Ending X position.
+            y1 (int):  Ending Y position.
+            data (bytes): Data buffer to write.
+        """
+        self.window(x0, y0, x1, y1)
+        self.write_data(data)
+
+    def window(self, x0, y0, x1, y1):
+        """Set the address window of the following write_data calls."""
+
+        self.window_x0 = x0
+        self.window_y0 = y0
+        self.window_width = x1 - x0 + 1
+        self.window_height = y1 - y0 + 1
+        self.cursor = 0
+
+    @micropython.native
+    def write_data(self, data):
+        """Write pixel data at the current window position.
+
+        Args:
+            data (bytes): RGB888 data, continuing the current window.
+        """
+        view = memoryview(data)
+        pixels = len(data) // 3
+        window_width = self.window_width
+        window_size = window_width * self.window_height
+        offset = 0
+
+        while offset < pixels:
+            cursor = self.cursor % window_size
+            row, column = divmod(cursor, window_width)
+            count = min(window_width - column, pixels - offset)
+
+            self.write_row(self.window_x0 + column, self.window_y0 + row, view[offset * 3:(offset + count) * 3], count)
+
+            offset += count
+            self.cursor = cursor + count
+
+    @micropython.native
+    def write_row(self, x, y, data, count):
+        """Copy a horizontal run of pixels into the tiles it covers."""
+
+        size = self.tile_width
+        filled = self.full_row
+        tile_y, row = divmod(y, self.tile_height)
+        offset = 0
+
+        while offset < count:
+            tile_x, column = divmod(x + offset, size)
+            n = min(size - column, count - offset)
+            tile = self.get_tile(tile_y * self.columns + tile_x)
+
+            start = row * size + column
+            tile.buffer[start * 3:(start + n) * 3] = data[offset * 3:(offset + n) * 3]
+            tile.mask[start:start + n] = filled[:n]
+
+            offset += n
+
+    def get_tile(self, index):
+        """Return the tile at index, allocating or recycling one if needed."""
+
+        tile = self.tiles.get(index)
+
+        if tile != None:
+            return tile
+
+        if self.free:
+            tile = self.free.pop()
+        elif self.allocated < self.max_tiles:
+            tile = Tile(self.tile_width, self.tile_height)
+            self.allocated += 1
+        else:
+            # Make room by flushing the oldest tile of the frame
+            oldest = next(iter(self.tiles))
+            tile = self.tiles.pop(oldest)
+            self.flush_tile(tile)
+            self.early_flushes += 1
+
+        tile_y, tile_x = divmod(index, self.columns)
+        tile.x = tile_x * self.tile_width
+        tile.y = tile_y * self.tile_height
+        tile.width = min(self.tile_width, self.width - tile.x)
+        tile.height = min(self.tile_height, self.height - tile.y)
+
+        self.tiles[index] = tile
+        return tile
+
+    @micropython.native
+    def flush_tile(self, tile):
+        """Send the written pixels of a tile to the display and reset it."""
+
+        size = self.tile_width
+        mask = tile.mask
+        filled = self.FILLED
+        rect_runs = None
+        rect_start = 0
+
+        for row in range(tile.height + 1):
+            runs = None
+
+            if row < tile.height:
+                runs = self.row_runs(mask, row * size, tile.width, filled)
+
+            if runs == rect_runs:
+                continue
+
+            # Rows rect_start to row - 1 share the same runs
+            if rect_runs:
+                self.flush_rect(tile, rect_start, row, rect_runs)
+
+            rect_runs = runs
+            rect_start = row
+
+        mask[:] = self.empty_mask
+        self.flushed_tiles += 1
+
+    def row_runs(self, mask, start, width, filled):
+        """Return (first, end) column runs of written pixels in a tile row."""
+
+        runs = []
+        column = 0
+
+        while column < width:
+            while column < width and mask[start + column] != filled:
+                column += 1
+
+            first = column
+
+            while column < width and mask[start + column] == filled:
+                column += 1
+
+            if column > first:
+                runs.append((first, column))
+
+        return runs
+
+    def flush_rect(self, tile, row_start, row_end, runs):
+        """Send rows row_start to row_end - 1 of each run of a tile."""
+
+        size = self.tile_width
+        view = tile.view
+
+        for first, end in runs:
+            self.gpu.window(tile.x + first, tile.y + row_start, tile.x + end - 1, tile.y + row_end - 1)
+            self.flushed_windows += 1
+            self.flushed_pixels += (end - first) * (row_end - row_start)
+
+            if first == 0 and end == size:
+                # Full tile rows are contiguous in the buffer
+                self.gpu.write_data(view[row_start * size * 3:row_end * size * 3])
+                continue
+
+            for row in range(row_start, row_end):
+                start = (row * size + first) * 3
+                self.gpu.write_data(view[start:start + (end - first) * 3])
+
+    def flush(self):
+        """Flush every dirty tile, top to bottom, and release the tiles."""
+
+        for index in sorted(self.tiles):
+            tile = self.tiles[index]
+            self.flush_tile(tile)
+            self.free.append(tile)
+
+        self.tiles = OrderedDict()
+
+    def discard(self):
+        """Drop every pending tile without sending it."""
+
+        for index in self.tiles:
+            tile = self.tiles[index]
+            tile.mask[:] = self.empty_mask
+            self.free.append(tile)
+
+        self.tiles = OrderedDict()
+
+    def clear(self, color=0, hlines=None, planner=None):
+        """Clear display, dropping the pending tiles it would overwrite."""
+
+        self.discard()
+        self.gpu.clear(color, hlines, planner)
+
+    def display_off(self):
+        self.gpu.display_off()
+
+    def display_on(self):
+        self.gpu.display_on()
+
+    def stats(self):
+        return {'tiles': len(self.tiles),
+                'allocated': self.allocated,
+                'max_tiles': self.max_tiles,
+                'flushed_tiles': self.flushed_tiles,
+                'early_flushes': self.early_flushes,
+                'flushed_windows': self.flushed_windows,
+                'flushed_pixels': self.flushed_pixels}
@@ -0,0 +1,229 @@
+class DisplayList:
+    X0      = const(0)
+    Y0      = const(1)
+    X1      = const(2)
+    Y1      = const(3)
+    OPAQUE  = const(4)
+    FILL    = const(5)
+    METHOD  = const(6)
+    ARGS    = const(7)
+    CLIP    = const(8)
+
+    COVERS  = const(16)   # Opaque operations an operation is checked against
+    WINDOW  = const(16)   # Following operations merged with or moved past
+    MAX_OPS = const(256)  # Longer lists are replayed as recorded
+
+    def __init__(self, width, height):
+        """Deferred list of Kitty draw calls.
+
+        Args:
+            width (int): Display width.
+            height (int): Display height.
+        Note:
+            Every operation keeps its screen bounds, whether it paints all
+            of them, and its colour when it is a plain rectangle fill. On
+            flush, operations hidden under a later opaque operation are
+            dropped, same colour fills that form a rectangle together are
+            merged, and contiguous windows are moved next to each other.
+            Operations only move past operations they do not overlap, so
+            the final image is the same as drawing immediately. Calls
+            recorded while Kitty has a clip keep the clip, and their bounds
+            are cut to it. Each operation only meets the COVERS largest
+            opaque operations above it and the WINDOW operations after it,
+            so flushing stays linear in the number of operations. Above
+            MAX_OPS the operations are replayed as recorded.
+        """
+
+        self.width = width
+        self.height = height
+        self.ops = []
+        self.clip = None
+        self.recorded = 0
+        self.dropped = 0
+        self.merged = 0
+        self.replayed = 0
+
+    def record(self, method, args, x0, y0, x1, y1, opaque, fill = None):
+        """Record a draw call.
+
+        Args:
+            method (function): Kitty method replaying the call.
+            args (tuple): Arguments of the call.
+            x0, y0, x1, y1 (int): Bounds painted by the call, inclusive.
+            opaque (bool): True if every pixel of the bounds is painted.
+            fill (Optional int): Colour, if the call fills its bounds with it.
+        """
+        # Kitty drops most primitives crossing the screen edge, they may paint nothing
+        if x0 < 0 or y0 < 0 or x1 >= self.width or y1 >= self.height:
+            opaque = False
+            fill = None
+
+        clip = self.clip
+
+        if clip != None:
+            x0 = max(x0, clip[0])
+            y0 = max(y0, clip[1])
+            x1 = min(x1, clip[0] + clip[2] - 1)
+            y1 = min(y1, clip[1] + clip[3] - 1)
+
+        if x1 < x0 or y1 < y0:
+            return
+
+        self.ops.append([x0, y0, x1, y1, opaque, fill, method, args, clip])
+        self.recorded += 1
+
+    def overlaps(self, a, b):
+        return a[self.X0] <= b[self.X1] and b[self.X0] <= a[self.X1] and a[self.Y0] <= b[self.Y1] and b[self.Y0] <= a[self.Y1]
+
+    def covers(self, a, b):
+        """Return True if opaque operation a paints all of b."""
+        return a[self.X0] <= b[self.X0] and a[self.Y0] <= b[self.Y0] and a[self.X1] >= b[self.X1] and a[self.Y1] >= b[self.Y1]
+
+    def can_move(self, ops, op, start, end):
+        """Return True if op does not overlap ops[start:end]."""
+        for i in range(start, end):
+            if self.overlaps(ops[i], op):
+                return False
+        return True
+
+    def area(self, op):
+        return (op[self.X1] - op[self.X0] + 1) * (op[self.Y1] - op[self.Y0] + 1)
+
+    def add_cover(self, above, areas, op):
+        """Keep op among the COVERS largest opaque operations."""
+        area = self.area(op)
+
+        if len(above) < self.COVERS:
+            above.append(op)
+            areas.append(area)
+            return
+
+        smallest = areas.index(min(areas))
+
+        if area > areas[smallest]:
+            above[smallest] = op
+            areas[smallest] = area
+
+    def cull(self, ops):
+        """Drop operations fully covered by a later opaque operation."""
+        above = []
+        areas = []
+        kept = []
+
+        for op in reversed(ops):
+            covered = False
+
+            for cover in above:
+                if self.covers(cover, op):
+                    covered = True
+                    break
+
+            if covered:
+                self.dropped += 1
+                continue
+
+            if op[self.OPAQUE]:
+                self.add_cover(above, areas, op)
+
+            kept.append(op)
+
+        kept.reverse()
+        return kept
+
+    def mergeable(self, a, b):
+        """Return True if fills a and b form a single rectangle."""
+        if a[self.FILL] == None or a[self.FILL] != b[self.FILL]:
+            return False
+
+        if a[self.X0] == b[self.X0] and a[self.X1] == b[self.X1]:
+            return a[self.Y0] <= b[self.Y1] + 1 and b[self.Y0] <= a[self.Y1] + 1
+
+        if a[self.Y0] == b[self.Y0] and a[self.Y1] == b[self.Y1]:
+            return a[self.X0] <= b[self.X1] + 1 and b[self.X0] <= a[self.X1] + 1
+
+        return False
+
+    def merge(self, ops):
+        """Merge fills of the same colour that form a single rectangle."""
+        i = 0
+
+        while i < len(ops):
+            a = ops[i]
+            j = i + 1
+
+            while a[self.FILL] != None and j < len(ops) and j <= i + self.WINDOW:
+                b = ops[j]
+
+                if b[self.FILL] == a[self.FILL] and self.mergeable(a, b) and (self.can_move(ops, b, i + 1, j) or self.can_move(ops, a, i + 1, j)):
+                    a[self.X0] = min(a[self.X0], b[self.X0])
+                    a[self.Y0] = min(a[self.Y0], b[self.Y0])
+                    a[self.X1] = max(a[self.X1], b[self.X1])
+                    a[self.Y1] = max(a[self.Y1], b[self.Y1])
+                    a[self.METHOD] = None
+
+                    if not self.can_move(ops, b, i + 1, j):
+                        # Merged fill takes the later position
+                        ops.pop(j)
+                        ops.insert(j, a)
+                        ops.pop(i)
+                        a = ops[i]
+                        j = i + 1
+                    else:
+                        ops.pop(j)
+
+                    self.merged += 1
+                    continue
+
+                j += 1
+
+            i += 1
+
+        return ops
+
+    def order(self, ops):
+        """Move windows that continue the previous one right after it."""
+        for i in range(len(ops) - 1):
+            a = ops[i]
+
+            for j in range(i + 1, min(len(ops), i + 1 + self.WINDOW)):
+                b = ops[j]
+
+                if b[self.X0] == a[self.X0] and b[self.X1] == a[self.X1] and b[self.Y0] == a[self.Y1] + 1:
+                    if j > i + 1 and self.can_move(ops, b, i + 1, j):
+                        ops.insert(i + 1, ops.pop(j))
+                    break
+
+        return ops
+
+    def flush(self, kitty):
+        """Optimise and replay the recorded operations.
+
+        Args:
+            kitty (Kitty): Graphics library drawing the operations.
+        """
+        ops = self.ops
+        self.ops = []
+
+        if len(ops) <= self.MAX_OPS:
+            ops = self.order(self.merge(self.cull(ops)))
+
+        for op in ops:
+            if op[self.METHOD] == None:
+                x0 = op[self.X0]
+                y0 = op[self.Y0]
+                kitty.draw_normal_box(x0, y0, op[self.X1] - x0 + 1, op[self.Y1] - y0 + 1, op[self.FILL])
+            elif op[self.CLIP] != None:
+                kitty.set_clip(*op[self.CLIP])
+                op[self.METHOD](*op[self.ARGS])
+                kitty.reset_clip()
+            else:
+                op[self.METHOD](*op[self.ARGS])
+
+            self.replayed += 1
+
+    def stats(self):
+        return {'pending': len(self.ops),
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'merged': self.merged,
+                'replayed': self.replayed}
@@ -0,0 +1,190 @@
+import struct
+
+class RawImage:
+    MAGIC = b'KRI'
+    VERSION = 1
+    HEADER = '<3sBHHH'
+    HEADER_SIZE = 10
+    RGB888 = 0
+
+    def __init__(self, f):
+        """Kitty raw image (.kri) reader.
+
+        Args:
+            f (file): Image file opened in binary mode.
+        Note:
+            The header holds the magic b'KRI', the version, width, height
+            and pixel format. Rows follow top to bottom with no padding,
+            3 bytes per pixel in panel byte order (R, G, B), so they can
+            be streamed to the display as they are.
+        """
+
+        f.seek(0)
+        magic, version, width, height, pixel_format = struct.unpack(self.HEADER, f.read(self.HEADER_SIZE))
+
+        if magic != self.MAGIC or version != self.VERSION or pixel_format != self.RGB888:
+            raise ValueError('Unsupported raw image')
+
+        self.file = f
+        self.width = width
+        self.height = height
+        self.data_offset = self.HEADER_SIZE
+
+    def seek_row(self, row):
+        self.file.seek(self.data_offset + row * self.width * 3)
+
+    def read_rows(self, row, count, buf):
+        """Read count rows starting at row into buf, in panel byte order."""
+
+        self.seek_row(row)
+        return self.file.readinto(buf[:count * self.width * 3])
+
+    @classmethod
+    def write(cls, f, width, height, rows):
+        """Write a raw image.
+
+        Args:
+            f (file): Destination file opened in binary mode.
+            width (int): Image width.
+            height (int): Image height.
+            rows (iterable): RGB888 bytes of each row, top to bottom.
+        """
+
+        f.write(struct.pack(cls.HEADER, cls.MAGIC, cls.VERSION, width, height, cls.RGB888))
+
+        for row in rows:
+            f.write(row)
+
+class BmpImage:
+    MAGIC = b'BM'
+
+    def __init__(self, f):
+        """Windows bitmap (.bmp) reader.
+
+        Args:
+            f (file): Image file opened in binary mode.
+        Note:
+            Supports uncompressed 1, 4, 8, 16, 24 and 32 bits per pixel
+            images, bottom-up or top-down, with 4 byte row padding and
+            16 bit RGB555 or RGB565 bitfields. Rows are converted to
+            panel byte order on read, so prefer raw images for speed.
+        """
+
+        f.seek(0)
+        header = f.read(54)
+
+        if header[0:2] != self.MAGIC:
+            raise ValueError('Not a bitmap')
+
+        self.file = f
+        self.data_offset = struct.unpack('<I', header[10:14])[0]
+        info_size = struct.unpack('<I', header[14:18])[0]
+        self.width, height = struct.unpack('<ii', header[18:26])
+        self.bpp = struct.unpack('<H', header[28:30])[0]
+        compression = struct.unpack('<I', header[30:34])[0]
+        colors = struct.unpack('<I', header[46:50])[0]
+
+        # Negative height means rows are stored top to bottom
+        self.bottom_up = height > 0
+        self.height = abs(height)
+        self.stride = ((self.width * self.bpp + 31) // 32) * 4
+
+        self.palette = None
+        self.green_bits = 5
+
+        if compression == 3 and self.bpp == 16:
+            f.seek(14 + info_size if info_size > 40 else 54)
+            red_mask, green_mask = struct.unpack('<II', f.read(8))
+            self.green_bits = 6 if green_mask == 0x07E0 else 5
+        elif compression not in (0, 3):
+            raise ValueError('Compressed bitmaps are not supported')
+
+        if self.bpp <= 8:
+            f.seek(14 + info_size)
+            palette = f.read(4 * (colors or (1 << self.bpp)))
+            self.palette = bytearray()
+
+            for i in range(0, len(palette), 4):
+                self.palette.append(palette[i + 2])
+                self.palette.append(palette[i + 1])
+                self.palette.append(palette[i])
+        elif self.bpp not in (16, 24, 32):
+            raise ValueError('Unsupported bitmap depth {0}'.format(self.bpp))
+
+        self.line = bytearray(self.stride)
+
+    def seek_row(self, row):
+        if self.bottom_up:
+            row = self.height - 1 - row
+
+        self.file.seek(self.data_offset + row * self.stride)
+
+    def read_rows(self, row, count, buf):
+        """Read count rows starting at row into buf, in panel byte order."""
+
+        width = self.width
+        line = self.line
+
+        for i in range(count):
+            self.seek_row(row + i)
+            self.file.readinto(line)
+            self.convert_row(line, buf, i * width * 3)
+
+        return count * width * 3
+
+    def convert_row(self, line, buf, offset):
+        """Convert one bitmap row to RGB888 into buf at offset."""
+
+        width = self.width
+        bpp = self.bpp
+
+        if bpp == 24 or bpp == 32:
+            step = bpp // 8
+
+            for x in range(width):
+                i = x * step
+                o = offset + x * 3
+                buf[o] = line[i + 2]
+                buf[o + 1] = line[i + 1]
+                buf[o + 2] = line[i]
+        elif bpp == 16:
+            six = self.green_bits == 6
+
+            for x in range(width):
+                v = line[2 * x] | (line[2 * x + 1] << 8)
+                o = offset + x * 3
+
+                if six:
+                    buf[o] = (v >> 8) & 0xF8
+                    buf[o + 1] = (v >> 3) & 0xFC
+                else:
+                    buf[o] = (v >> 7) & 0xF8
+                    buf[o + 1] = (v >> 2) & 0xF8
+
+                buf[o + 2] = (v << 3) & 0xF8
+        else:
+            palette = self.palette
+            per_byte = 8 // bpp
+            mask = (1 << bpp) - 1
+
+            for x in range(width):
+                shift = (per_byte - 1 - x % per_byte) * bpp
+                p = ((line[x // per_byte] >> shift) & mask) * 3
+                o = offset + x * 3
+                buf[o] = palette[p]
+                buf[o + 1] = palette[p + 1]
+                buf[o + 2] = palette[p + 2]
+
+def open_image(f):
+    """Return the reader matching an image file opened in binary mode."""
+
+    f.seek(0)
+    magic = f.read(3)
+
+    if magic == RawImage.MAGIC:
+        return RawImage(f)
+
+    if magic[0:2] == BmpImage.MAGIC:
+        return BmpImage(f)
+
+    raise ValueError('Unknown image format')
@@ -1,7 +1,21 @@
 from math import floor
+from array import array
+from collections import OrderedDict
 import ustruct
+from lib.graphical.compositor import Compositor
+from lib.graphical.clip import Clip
+from lib.graphical.display_list import DisplayList
+from lib.graphical.image import RawImage, open_image
+from lib.system.transfer import ChunkPlanner
+from lib.system.spi_trace import traced
 
 class Color:
+    CACHE_SIZE = const(32)
+    
+    # Shared memo of parsed hex strings and packed patterns, oldest first
+    values = OrderedDict()
+    patterns = OrderedDict()
+    
     @classmethod
     def rgb(self, r, g, b):
         """Return 24-bit color value.
@@ -20,55 +34,351 @@ class Color:
 
         Args:
             hex_color (string): Hex color representation.
+        Note:
+            Results are memoised, the least recently used strings are
+            forgotten past CACHE_SIZE entries.
         """
         
-        hex_color = hex_color.lstrip("#")
-        r = int(hex_color[0:2], 16)
-        g = int(hex_color[2:4], 16)
-        b = int(hex_color[4:6], 16)
+        values = self.values
+        color = values.pop(hex_color, None)
+        
+        if color == None:
+            digits = hex_color.lstrip("#")
+            r = int(digits[0:2], 16)
+            g = int(digits[2:4], 16)
+            b = int(digits[4:6], 16)
+            color = self.rgb(r, g, b)
+            
+            if len(values) >= self.CACHE_SIZE:
+                values.pop(next(iter(values)))
+        
+        values[hex_color] = color
+        return color
+    
+    @classmethod
+    def parse(self, value):
+        """Return value as a 24-bit color, accepting hex strings and ints.
+
+        Args:
+            value (string | int | None): Color, None is kept as None.
+        """
+        
+        if value == None or type(value) == int:
+            return value
+        
+        return self.hex(value)
+    
+    @classmethod
+    def pattern(self, color):
+        """Return the 3 panel bytes of a 24-bit color, memoised.
 
-        return self.rgb(r, g, b)
+        Args:
+            color (int): RGB888 color value.
+        """
+        
+        patterns = self.patterns
+        packed = patterns.pop(color, None)
+        
+        if packed == None:
+            packed = color.to_bytes(3, 'big')
+            
+            if len(patterns) >= self.CACHE_SIZE:
+                patterns.pop(next(iter(patterns)))
+        
+        patterns[color] = packed
+        return packed
+
+class Glyph:
+    OVERHEAD = const(32)
+    
+    def __init__(self, width, height, pixels):
+        """Decoded glyph.
+
+        Args:
+            width (int): Glyph width.
+            height (int): Glyph height.
+            pixels (bytes): X,Y pairs of the lit pixels, portrait orientation.
+        """
+        
+        self.width = width
+        self.height = height
+        self.pixels = pixels
+        self.runs = None
+        self.vertical_runs = False
+    
+    def size(self):
+        """Return approximate RAM used by the glyph, in bytes."""
+        
+        size = len(self.pixels) + self.OVERHEAD
+        
+        if self.runs != None:
+            size += len(self.runs)
+        
+        return size
+    
+    @micropython.native
+    def build_runs(self):
+        """Group lit pixels into runs of adjacent pixels.
+
+        Runs are stored as (line, start, length) triples, along rows or
+        along columns, whichever needs fewer runs.
+        """
+        
+        pixels = self.pixels
+        rows = [[] for _ in range(self.height)]
+        
+        # Pixels are decoded column by column, so columns are already sorted
+        columns = bytearray()
+        last_x = -1
+        last_y = -2
+        
+        for i in range(0, len(pixels), 2):
+            x = pixels[i]
+            y = pixels[i + 1]
+            rows[y].append(x)
+            
+            if x == last_x and y == last_y + 1:
+                columns[-1] += 1
+            else:
+                columns.append(x)
+                columns.append(y)
+                columns.append(1)
+            
+            last_x = x
+            last_y = y
+        
+        horizontal = bytearray()
+        
+        for y in range(self.height):
+            last_x = -2
+            
+            for x in sorted(rows[y]):
+                if x == last_x + 1:
+                    horizontal[-1] += 1
+                else:
+                    horizontal.append(y)
+                    horizontal.append(x)
+                    horizontal.append(1)
+                
+                last_x = x
+        
+        if len(columns) < len(horizontal):
+            self.runs = bytes(columns)
+            self.vertical_runs = True
+        else:
+            self.runs = bytes(horizontal)
+            self.vertical_runs = False
+
+class GlyphCache:
+    def __init__(self, budget = 4096):
+        """LRU cache of decoded glyphs shared by all fonts.
+
+        Args:
+            budget (Optional int): Maximum bytes kept by the cache (Default: 4096).
+        """
+        
+        self.budget = budget
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+    
+    def get(self, font, letter):
+        """Return decoded glyph of letter, or None if font does not contain it."""
+        
+        key = (font.font_id << 16) | ord(letter)
+        glyph = self.entries.pop(key, None)
+        
+        if glyph != None:
+            self.hits += 1
+            self.entries[key] = glyph
+            return glyph
+        
+        self.misses += 1
+        glyph = font.decode(letter)
+        
+        if glyph != None:
+            self.entries[key] = glyph
+            self.used += glyph.size()
+            self.evict()
+        
+        return glyph
+    
+    def evict(self):
+        """Drop least recently used glyphs until the budget is respected."""
+        
+        while self.used > self.budget and len(self.entries) > 1:
+            glyph = self.entries.pop(next(iter(self.entries)))
+            self.used -= glyph.size()
+            self.evictions += 1
+    
+    def get_runs(self, glyph):
+        """Return run list of a cached glyph, building it on first use."""
+        
+        if glyph.runs == None:
+            glyph.build_runs()
+            self.used += len(glyph.runs)
+            self.evict()
+        
+        return glyph.runs
+    
+    def set_budget(self, budget):
+        self.budget = budget
+        self.evict()
+    
+    def clear(self):
+        self.entries = OrderedDict()
+        self.used = 0
+    
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'glyphs': len(self.entries),
+                'used': self.used,
+                'budget': self.budget}
 
 class Font:
     bit_pos = {1: 0, 2: 1, 4: 2, 8: 3, 16: 4, 32: 5, 64: 6, 128: 7, 256: 8}
     
-    def __init__(self, path, width, height, start_letter = 32, letter_count = 96):
-        """Load X-GLCD font data from text file.
+    MAGIC = b'KBF'
+    HEADER = '<3sBBBHH'
+    HEADER_SIZE = const(10)
+    PRELOAD_LIMIT = const(8192)
+    
+    cache = GlyphCache()
+    next_id = 0
+    
+    def __init__(self, path, width = None, height = None, start_letter = 32, letter_count = None):
+        """Load a Kitty binary font (.kbf) or an X-GLCD text font (.cff).
 
         Args:
             path (string): Full path of font file.
+            width (Optional int): Maximum glyph width, required for .cff fonts.
+            height (Optional int): Glyph height, required for .cff fonts.
+            start_letter (Optional int): First letter of .cff fonts (Default: 32).
+            letter_count (Optional int): Letters to load from .cff fonts (Default: all).
+        Note:
+            Binary fonts are produced by tools/font_converter.py. Their glyph
+            widths and offsets are kept in RAM and the bitmaps are loaded
+            once, or read straight from flash when larger than PRELOAD_LIMIT.
+            Text fonts are parsed once at load time into the same layout.
         """
         
+        self.font_id = Font.next_id
+        Font.next_id += 1
+        self.font_path = path
         self.width = width
         self.height = height
         self.start_letter = start_letter
         self.letter_count = letter_count
-        self.bytes_per_letter = self.load_font(path)
-        self.font_path = path
+        self.widths = None
+        self.offsets = None
+        self.bitmaps = None
+        self.bitmaps_offset = 0
+        
+        self.load_font(path)
+        self.byte_height = (self.height + 7) // 8
     
     def load_font(self, path):
-        length = 0
+        with open(path, 'rb') as f:
+            is_binary = f.read(3) == self.MAGIC
+        
+        if is_binary:
+            self.load_binary(path)
+        else:
+            self.load_text(path)
+    
+    def load_binary(self, path):
+        with open(path, 'rb') as f:
+            magic, version, width, height, start_letter, letter_count = ustruct.unpack(self.HEADER, f.read(self.HEADER_SIZE))
+            
+            if version != 1:
+                raise RuntimeError('Unsupported font version {0}'.format(version))
+            
+            self.width = width
+            self.height = height
+            self.start_letter = start_letter
+            self.letter_count = letter_count
+            self.widths = f.read(letter_count)
+            self.offsets = self.build_offsets(self.widths, (height + 7) // 8)
+            self.bitmaps_offset = self.HEADER_SIZE + letter_count
+            
+            if self.offsets[-1] <= self.PRELOAD_LIMIT:
+                self.bitmaps = memoryview(f.read(self.offsets[-1]))
+    
+    def load_text(self, path):
+        if self.width == None or self.height == None:
+            raise RuntimeError('Text fonts need width and height.')
+        
+        byte_height = (self.height + 7) // 8
+        widths = bytearray()
+        bitmaps = bytearray()
         
         with open(path, 'r') as f:
             for line in f:
-                length = len(bytearray(line, 'utf-8'))
-                break
+                if self.letter_count != None and len(widths) >= self.letter_count:
+                    break
+                
+                line = line.strip()
+                if not line:
+                    continue
+                
+                record = bytearray(int(b, 16) for b in line.split(','))
+                widths.append(record[0])
+                bitmaps.extend(record[1:1 + record[0] * byte_height])
         
-        return length
+        self.letter_count = len(widths)
+        self.widths = bytes(widths)
+        self.offsets = self.build_offsets(self.widths, byte_height)
+        self.bitmaps = memoryview(bytes(bitmaps))
+    
+    def build_offsets(self, widths, byte_height):
+        """Return the offset of each glyph bitmap, plus the total size."""
+        
+        offsets = array('H', bytes(2 * (len(widths) + 1)))
+        offset = 0
+        
+        for i in range(len(widths)):
+            offsets[i] = offset
+            offset += widths[i] * byte_height
+        
+        offsets[len(widths)] = offset
+        return offsets
+    
+    def index(self, letter):
+        """Return glyph index of letter, or -1 if the font does not contain it."""
+        
+        letter_index = ord(letter) - self.start_letter
+        
+        if letter_index < 0 or letter_index >= self.letter_count:
+            return -1
+        
+        return letter_index
     
     @micropython.native
     def letters(self, letter):
-        letter_index = ord(letter) - self.start_letter
-        offset = self.bytes_per_letter * letter_index
+        """Return width and column bytes of letter.
+
+        Args:
+            letter (string): Letter to return (must exist within font).
+        Returns:
+            (int, memoryview): Glyph width and column bytes, top to bottom.
+        """
+        
+        letter_index = self.index(letter)
+        start = self.offsets[letter_index]
+        end = self.offsets[letter_index + 1]
+        
+        if self.bitmaps != None:
+            return self.widths[letter_index], self.bitmaps[start:end]
         
         with open(self.font_path, 'rb') as f:
-            f.seek(offset)
-            line = f.read(self.bytes_per_letter - 1)
-            line = line.decode('utf8')
-            letter_bytes = bytearray(int(b, 16) for b in line.split(','))
-            f.close()
+            f.seek(self.bitmaps_offset + start)
+            columns = f.read(end - start)
             
-        return letter_bytes
+        return self.widths[letter_index], memoryview(columns)
     
     def lit_bits(self, n):
         """Return positions of 1 bits only."""
@@ -83,50 +393,49 @@ class Font:
         """Return width and height of letter."""
         
         # Get index of letter
-        letter_ord = ord(letter) - self.start_letter
+        letter_index = self.index(letter)
         
         # Confirm font contains letter
-        if letter_ord >= self.letter_count:
+        if letter_index < 0:
             print('Font does not contain character: ' + letter)
             return 0, 0
         
-        return self.letters(letter)[0], self.height
+        return self.widths[letter_index], self.height
+    
+    def get_glyph(self, letter):
+        """Return cached decoded glyph of letter, or None if missing."""
+        
+        return self.cache.get(self, letter)
     
     @micropython.native
-    def get_letter(self, letter, landscape=False):
-        """Convert letter byte data to X,Y pixels for transparent drawing.
+    def decode(self, letter):
+        """Decode column bytes of letter into its lit pixels.
 
         Args:
-            letter (string): Letter to return (must exist within font).
-            landscape (bool): Orientation (default: False = portrait)
-        Yields:
-            (int, int): X,Y relative position of bits to draw
+            letter (string): Letter to decode.
+        Returns:
+            Glyph: Decoded glyph, None if the font does not contain letter.
         """
         
-        # Get index of letter
-        letter_ord = ord(letter) - self.start_letter
-        
         # Confirm font contains letter
-        if letter_ord >= self.letter_count:
+        if self.index(letter) < 0:
             print('Font does not contain character: ' + letter)
-            return b'', 0, 0
-
-        # Get width of letter (specified by first byte)
-        letter_height = self.height
+            return None
+        
+        width, columns = self.letters(letter)
+        pixels = bytearray()
         x = 0
 
         # Determine number of bytes per letter Y column
-        byte_height = int(letter_height / 8) + (letter_height % 8 > 0)
+        byte_height = self.byte_height
         bh = 0
         
         # Loop through letter byte data and convert to pixel data
-        for b in self.letters(letter)[1:]:
+        for b in columns:
             # Process only colored bits
             for bit in self.lit_bits(b):
-                if landscape:
-                    yield letter_height - ((bh << 3) + bit), x
-                else:
-                    yield x, (bh << 3) + bit
+                pixels.append(x)
+                pixels.append((bh << 3) + bit)
             
             if bh < byte_height - 1:
                 # Next column byte
@@ -135,6 +444,33 @@ class Font:
                 # Next column
                 x += 1
                 bh = 0
+        
+        return Glyph(width, self.height, bytes(pixels))
+    
+    @micropython.native
+    def get_letter(self, letter, landscape=False):
+        """Convert letter byte data to X,Y pixels for transparent drawing.
+
+        Args:
+            letter (string): Letter to return (must exist within font).
+            landscape (bool): Orientation (default: False = portrait)
+        Yields:
+            (int, int): X,Y relative position of bits to draw
+        """
+        
+        glyph = self.get_glyph(letter)
+        
+        if glyph == None:
+            return
+        
+        letter_height = self.height
+        pixels = glyph.pixels
+        
+        for i in range(0, len(pixels), 2):
+            if landscape:
+                yield letter_height - pixels[i + 1], pixels[i]
+            else:
+                yield pixels[i], pixels[i + 1]
     
     @micropython.native
     def get_text_width_height(self, text):
@@ -147,76 +483,375 @@ class Font:
         
         return total_width, total_height
     
+class BufferPool:
+    def __init__(self, count = 4, size = 3072):
+        """Preallocated scratch buffers for drawing.
+
+        Args:
+            count (Optional int): Number of buffers (Default: 4).
+            size (Optional int): Size of each buffer in bytes (Default: 3072).
+        Note:
+            Buffers are handed out least recently used first as memoryview
+            slices, so up to count buffers can be used at once. A buffer
+            filled with a colour is reused as is while nothing draws on it.
+        """
+        
+        self.size = size - size % 3
+        self.buffers = [bytearray(self.size) for _ in range(count)]
+        self.views = [memoryview(buf) for buf in self.buffers]
+        
+        # Colour pattern each buffer holds and how many bytes of it
+        self.colors = [None] * count
+        self.filled = [0] * count
+        self.used = [0] * count
+        self.clock = 0
+        
+        self.allocations = count
+        self.oversized = 0
+        self.refills = 0
+        self.reuses = 0
+        self.scratches = 0
+    
+    def take(self):
+        """Return index of the least recently used buffer."""
+        
+        oldest = 0
+        
+        for i in range(1, len(self.used)):
+            if self.used[i] < self.used[oldest]:
+                oldest = i
+        
+        self.touch(oldest)
+        return oldest
+    
+    def touch(self, index):
+        self.clock += 1
+        self.used[index] = self.clock
+    
+    @micropython.native
+    def fill(self, color, pixels):
+        """Return a view of pixels pixels of color. It must not be drawn on.
+
+        Args:
+            color (int): RGB888 color value.
+            pixels (int): Number of pixels, at most size // 3.
+        """
+        
+        nbytes = pixels * 3
+        
+        for i in range(len(self.buffers)):
+            if self.colors[i] == color and self.filled[i] >= nbytes:
+                self.touch(i)
+                self.reuses += 1
+                return self.views[i][:nbytes]
+        
+        view = self.canvas(color, pixels)
+        
+        if len(view) <= self.size:
+            i = self.used.index(self.clock)
+            self.colors[i] = color
+            self.filled[i] = nbytes
+        
+        return view
+    
+    @micropython.native
+    def canvas(self, color, pixels):
+        """Return a view of pixels pixels of color, free to be drawn on."""
+        
+        nbytes = pixels * 3
+        
+        if nbytes > self.size:
+            self.oversized += 1
+            self.allocations += 1
+            return memoryview(bytearray(Color.pattern(color) * pixels))
+        
+        i = self.take()
+        buf = self.buffers[i]
+        self.colors[i] = None
+        self.refills += 1
+        
+        # Write the pattern once and double it in place
+        buf[0:3] = Color.pattern(color)
+        done = 3
+        
+        while done < nbytes:
+            n = min(done, nbytes - done)
+            buf[done:done + n] = buf[0:n]
+            done += n
+        
+        return self.views[i][:nbytes]
+    
+    def scratch(self, nbytes):
+        """Return a view of nbytes bytes with undefined content."""
+        
+        if nbytes > self.size:
+            self.oversized += 1
+            self.allocations += 1
+            return memoryview(bytearray(nbytes))
+        
+        i = self.take()
+        self.colors[i] = None
+        self.scratches += 1
+        return self.views[i][:nbytes]
+    
+    def stats(self):
+        return {'buffers': len(self.buffers),
+                'size': self.size,
+                'allocations': self.allocations,
+                'oversized': self.oversized,
+                'refills': self.refills,
+                'reuses': self.reuses,
+                'scratches': self.scratches}
+
 class Kitty():
-    def __init__(self, gpu):
+    POOL_BUFFERS = const(4)
+    
+    def __init__(self, gpu, planner = None):
+        self.display = gpu
         self.gpu = gpu
+        self.compositor = None
+        self.display_list = None
+        self.corner_masks = {}
+        
+        # Share the display's planner so one setting sizes every buffer
+        self.planner = planner or getattr(gpu, 'planner', None) or ChunkPlanner()
+        self.pool = None
+        self.build_pool()
+        
+        # Drivers with a transfer queue send a chunk while the next is built
+        self.queued = hasattr(gpu, 'acquire')
+        self.streaming = False
+        self.scroll_region = None
+        self.clip = None
+        self.clipping = False
+        
+        # Glyphs drawn since start, read by FrameStats
+        self.glyphs = 0
+    
+    def build_pool(self):
+        """(Re)allocate the drawing buffers from the planner.
+
+        Note:
+            Buffers hold at least a full display row. Their size follows
+            the planner and the free heap, and is halved when they cannot
+            be allocated.
+        """
+        minimum = self.display.width * 3
+        size = self.planner.buffer_size(self.POOL_BUFFERS, minimum)
+        self.pool = None
+        
+        while True:
+            try:
+                self.pool = BufferPool(self.POOL_BUFFERS, size)
+                return
+            except MemoryError:
+                if size <= minimum:
+                    raise
+                
+                size = max(minimum, (size // 2) - (size // 2) % 3)
+                self.planner.shrunk += 1
     
-    def reverse(self, byte_arr):
-        @micropython.asm_thumb
-        def reverse_asm(r0, r1):
-            add(r4, r0, r1)
-            sub(r4, 1)
-            label(LOOP)
-            ldrb(r5, [r0, 0])
-            ldrb(r6, [r4, 0])
-            strb(r6, [r0, 0])
-            strb(r5, [r4, 0])
-            add(r0, 1)
-            sub(r4, 1)
-            cmp(r4, r0)
-            bpl(LOOP)
-            
-        reverse_asm(byte_arr, len(byte_arr))
+    def set_chunk_bytes(self, chunk_bytes):
+        """Change the largest transfer buffer and rebuild the drawing buffers."""
+        self.flush()
+        self.planner.chunk_bytes = chunk_bytes
+        self.build_pool()
+    
+    def enable_compositor(self, tile_width = 120, tile_height = 16, budget = 32768):
+        """Draw into off-screen tiles that are sent on flush.
+
+        Args:
+            tile_width (Optional int): Tile width (Default: 120).
+            tile_height (Optional int): Tile height (Default: 16).
+            budget (Optional int): Bytes of RAM used by tiles (Default: 32768).
+        """
+        self.flush()
+        self.reset_clip()
+        self.compositor = Compositor(self.display, tile_width, tile_height, budget)
+        self.gpu = self.compositor
+        self.queued = False
+    
+    def disable_compositor(self):
+        """Flush pending tiles and draw straight to the display again."""
+        self.flush()
+        self.reset_clip()
+        self.compositor = None
+        self.gpu = self.display
+        self.queued = hasattr(self.display, 'acquire')
+    
+    def enable_display_list(self):
+        """Record draw calls and only draw them, optimised, on flush."""
+        if self.display_list == None:
+            self.display_list = DisplayList(self.display.width, self.display.height)
+    
+    def disable_display_list(self):
+        """Draw recorded calls and draw immediately again."""
+        self.flush()
+        self.display_list = None
+    
+    def set_clip(self, x, y, width, height):
+        """Only draw inside a rectangle until reset_clip().
+
+        Args:
+            x (int): Starting X position.
+            y (int): Starting Y position.
+            width (int): Width of the rectangle.
+            height (int): Height of the rectangle.
+        Note:
+            Primitives still draw whole, the clip drops the pixels outside
+            the rectangle on their way to the display. With the display
+            list the clip is recorded with each call and restored when
+            it is replayed.
+        """
+        if self.display_list != None:
+            self.display_list.clip = (x, y, width, height)
+            return
+        
+        target = self.display if self.compositor == None else self.compositor
+        
+        if self.clip == None:
+            self.clip = Clip(target)
+        
+        self.clip.gpu = target
+        self.clip.set(x, y, width, height)
+        self.clipping = True
+        self.gpu = self.clip
+        self.queued = False
+    
+    def reset_clip(self):
+        """Draw on the whole display again."""
+        if self.display_list != None:
+            self.display_list.clip = None
+        
+        if not self.clipping:
+            return
+        
+        self.clipping = False
+        self.gpu = self.display if self.compositor == None else self.compositor
+        self.queued = self.compositor == None and hasattr(self.display, 'acquire')
+    
+    @traced('Kitty.flush')
+    def flush(self):
+        """End the frame, sending everything drawn since the last flush."""
+        display_list = self.display_list
+        
+        if display_list != None:
+            # Replayed calls must draw instead of being recorded again
+            self.display_list = None
+            display_list.flush(self)
+            self.display_list = display_list
+        
+        if self.compositor != None:
+            self.compositor.flush()
+        
+        if hasattr(self.display, 'flush'):
+            self.display.flush()
+    
+    def stream_buffer(self, nbytes, previous = None):
+        """Return a buffer for the next nbytes of window data.
+
+        Args:
+            nbytes (int): Bytes that will be written to the buffer.
+            previous (Optional memoryview): Buffer of the previous chunk.
+        Note:
+            Fill the buffer and pass it, or a slice of it, to stream()
+            before asking for another one. With a transfer queue the
+            previous buffer is still being sent while this one is filled,
+            otherwise the previous buffer is reused so pool fills taken
+            for the loop are not recycled under it.
+        """
+        if self.queued:
+            view = self.gpu.acquire()
+            
+            if len(view) >= nbytes:
+                self.streaming = True
+                return view
+        
+        self.streaming = False
+        
+        if previous != None and len(previous) >= nbytes:
+            return previous
+        
+        return self.pool.scratch(nbytes)
+    
+    def stream(self, data):
+        """Send data of the last stream_buffer() to the current window."""
+        if self.streaming:
+            self.gpu.submit(data)
+        else:
+            self.gpu.write_data(data)
+    
+    def set_scroll_region(self, top, bottom):
+        """Define the area moved by scroll(), between fixed top and bottom lines.
+
+        Args:
+            top (int): Fixed lines at the start of the scroll axis, e.g. a status bar.
+            bottom (int): Fixed lines at the end of the scroll axis.
+        Note:
+            The axis is the display's scroll_x, X in landscape rotations.
+            Displays without hardware scrolling repaint the whole region.
+        """
+        self.flush()
+        axis_size = self.display.width if self.scroll_axis_x() else self.display.height
+        self.scroll_region = (top, axis_size - top - bottom)
+        
+        if hasattr(self.display, 'set_scroll_area'):
+            self.display.set_scroll_area(top, bottom)
+    
+    def scroll_axis_x(self):
+        """Return True if the display scrolls along X."""
+        return getattr(self.display, 'scroll_x', False)
+    
+    def scroll(self, lines, background = None):
+        """Scroll the region content and return the band that must be redrawn.
+
+        Args:
+            lines (int): Lines to move the content towards the start of the axis.
+            background (Optional int): RGB888 color the exposed band is cleared with.
+        Returns:
+            tuple: x, y, width and height of the exposed band.
+        """
+        self.flush()
+        
+        if self.scroll_region == None:
+            self.set_scroll_region(0, 0)
+        
+        top, count = self.scroll_region
+        start = top
+        
+        if hasattr(self.display, 'scroll'):
+            self.display.scroll(lines)
+            
+            if abs(lines) < count:
+                if lines > 0:
+                    start = top + count - lines
+                count = abs(lines)
+        
+        if self.scroll_axis_x():
+            band = (start, 0, count, self.gpu.height)
+        else:
+            band = (0, start, self.gpu.width, count)
+        
+        if background != None and count:
+            self.draw_box(band[0], band[1], band[2], band[3], background)
+        
+        return band
     
     @micropython.native
     def set_buffer_pix(self, x, y, w, b, color):
         offset = ((y * w) + x) * 3
-        b[offset:offset + 3] = color.to_bytes(3, 'big')
+        b[offset:offset + 3] = Color.pattern(color)
         return b
     
-    @micropython.native
-    def draw_circle(self, x0, y0, r, color):
-        diam = (r * 2)
-        arr_size = (diam + 1) * (diam + 1)
-        buffer = bytearray(arr_size * 3)
-        
-        def set_buffer_pix(xp, yp, color):
-            offset = ((yp * (diam + 1)) + xp) * 3
-            buffer[offset:offset + 3] = color.to_bytes(3, 'big')
-        
-        f = 1 - r
-        dx = 1
-        dy = -r - r
-        x = 0
-        y = r
-        
-        set_buffer_pix(r, diam, color)
-        set_buffer_pix(r, 0, color)
-        set_buffer_pix(diam, r, color)
-        set_buffer_pix(0, r, color)
-        
-        while x < y:
-            if f >= 0:
-                y -= 1
-                dy += 2
-                f += dy
-            x += 1
-            dx += 2
-            f += dx
-            
-            set_buffer_pix(r + x, r + y, color)
-            set_buffer_pix(r - x, r + y, color)
-            set_buffer_pix(r + x, r - y, color)
-            set_buffer_pix(r - x, r - y, color)
-            set_buffer_pix(r + y, r + x, color)
-            set_buffer_pix(r - y, r + x, color)
-            set_buffer_pix(r + y, r - x, color)
-            set_buffer_pix(r - y, r - x, color)
-        
-        self.gpu.block(x0, y0, x0 + diam, y0 + diam, buffer)
-    
+    @traced('Kitty.draw_box')
     @micropython.native
     def draw_box(self, x, y, width, height, color, bg_color = None, radius = None):
+        if self.display_list != None:
+            rounded = type(radius) == int and bg_color != None
+            self.display_list.record(self.draw_box, (x, y, width, height, color, bg_color, radius),
+                                     x, y, x + width - 1, y + height - 1, True, None if rounded else color)
+            return
+        
         if type(radius) == int and bg_color != None:
             self.draw_rounded_box(x, y, width, height, radius, color, bg_color)
         else:
@@ -233,127 +868,276 @@ class Kitty():
             h (int): Height of rectangle.
             color (int): RGB888 color value.
         """
+        if self.clipping:
+            # A clipped fill is a smaller fill
+            clip = self.clip
+            x0 = max(x, clip.x0)
+            y0 = max(y, clip.y0)
+            w = min(x + w - 1, clip.x1) - x0 + 1
+            h = min(y + h - 1, clip.y1) - y0 + 1
+            x = x0
+            y = y0
+            
+            if w <= 0 or h <= 0:
+                return
+        
         is_offgrid = self.is_off_grid(x, y, x + w - 1, y + h - 1)
         invalid_size = w == 0 or h == 0
         
         if is_offgrid or invalid_size:
             return
         
-        chunk_height = 1024 // w
+        chunk_height = self.planner.rows(w * 3, h, self.pool.size)
         chunk_count, remainder = divmod(h, chunk_height)
-        chunk_size = chunk_height * w
+        buf = self.pool.fill(color, chunk_height * w)
         chunk_y = y
-        if chunk_count:
-            buf = color.to_bytes(3, 'big') * chunk_size
-            for c in range(0, chunk_count):
-                self.gpu.block(x, chunk_y, x + w - 1, chunk_y + chunk_height - 1, buf)
-                chunk_y += chunk_height
+        
+        if self.queued and len(self.gpu.acquire()) >= len(buf):
+            # Pool fills are shared, each chunk is sent from a copy while the next is made
+            self.gpu.window(x, y, x + w - 1, y + h - 1)
+            
+            for r0 in range(0, h, chunk_height):
+                n = min(chunk_height, h - r0) * w * 3
+                view = self.gpu.acquire()
+                view[:n] = buf[:n]
+                self.gpu.submit(view[:n])
+            
+            return
+        
+        for c in range(0, chunk_count):
+            self.gpu.block(x, chunk_y, x + w - 1, chunk_y + chunk_height - 1, buf)
+            chunk_y += chunk_height
 
         if remainder:
-            buf = color.to_bytes(3, 'big') * remainder * w
-            self.gpu.block(x, chunk_y, x + w - 1, chunk_y + remainder - 1, buf)
+            self.gpu.block(x, chunk_y, x + w - 1, chunk_y + remainder - 1, buf[:remainder * w * 3])
+    
+    def corner_insets(self, radius):
+        """Return background inset of each corner row for a radius.
+
+        Args:
+            radius (int): Corner radius.
+        Returns:
+            bytes: Pixels to leave as background on each side of the first
+            radius rows, top to bottom. Bottom rows mirror them.
+        """
+        insets = self.corner_masks.get(radius)
+        
+        if insets != None:
+            return insets
+        
+        insets = bytearray(radius)
+        square_radius = radius ** 2
+        
+        for y in range(radius):
+            in_top_radius = (radius - y) ** 2
+            inset = 0
+            
+            while inset < radius and (radius - inset) ** 2 + in_top_radius > square_radius:
+                inset += 1
+            
+            insets[y] = inset
+        
+        insets = bytes(insets)
+        self.corner_masks[radius] = insets
+        return insets
     
     @micropython.native
     def draw_rounded_box(self, pos_x, pos_y, width, height, radius, fill_color, background_color):
-        size = (width * height)
-        b_r, b_g, b_b = background_color.to_bytes(3, 'big')
+        """Draw a filled box with rounded corners.
+
+        Args:
+            pos_x (int): Starting X position.
+            pos_y (int): Starting Y position.
+            width (int): Width of rectangle.
+            height (int): Height of rectangle.
+            radius (int): Corner radius.
+            fill_color (int): RGB888 color value.
+            background_color (int): RGB888 color of the pixels outside the corners.
+        """
+        radius = min(radius, width // 2, height // 2)
         
-        chunk_height = (1024 // width) - 1
-        chunk_size = chunk_height * width
+        if radius <= 0:
+            self.draw_normal_box(pos_x, pos_y, width, height, fill_color)
+            return
         
-        buf = bytearray(fill_color.to_bytes(3, 'big') * chunk_size)
-        chunk_y = 0
+        if self.is_off_grid(pos_x, pos_y, pos_x + width - 1, pos_y + height - 1):
+            return
         
-        square_radius = radius ** 2
-
-        for y in range(height):
-            if chunk_y >= chunk_height:
-                chunk_y = 0
-                
-                self.gpu.block(pos_x, pos_y, pos_x + width - 1, pos_y + chunk_height - 1, buf)
-                pos_y += chunk_height
-                
-                if chunk_height-1 >= height - y:
-                    chunk_height = height - y
-                    chunk_size = chunk_height * width
+        insets = self.corner_insets(radius)
+        
+        self.draw_corner_rows(pos_x, pos_y, width, insets, False, fill_color, background_color)
+        self.draw_normal_box(pos_x, pos_y + radius, width, height - radius * 2, fill_color)
+        self.draw_corner_rows(pos_x, pos_y + height - radius, width, insets, True, fill_color, background_color)
+    
+    @micropython.native
+    def draw_corner_rows(self, x, y, width, insets, bottom, fill_color, background_color):
+        """Stream the corner rows of a rounded box in a single window."""
+        radius = len(insets)
+        row_bytes = width * 3
+        chunk_height = self.planner.rows(row_bytes, radius, self.pool.size)
+        
+        fill = self.pool.fill(fill_color, width)
+        background = self.pool.fill(background_color, radius)
+        
+        buf = None
+        
+        self.gpu.window(x, y, x + width - 1, y + radius - 1)
+        
+        for r0 in range(0, radius, chunk_height):
+            r1 = min(r0 + chunk_height, radius)
+            buf = self.stream_buffer(chunk_height * row_bytes, buf)
+            
+            for row in range(r0, r1):
+                inset = insets[radius - 1 - row] if bottom else insets[row]
+                inset_bytes = inset * 3
+                start = (row - r0) * row_bytes
+                end = start + row_bytes
                 
-                buf = bytearray(fill_color.to_bytes(3, 'big') * chunk_size)
-
-            top = (y < radius)
-            bottom = (y >= height - radius)
-            row = (chunk_y * width)
-
-            in_top_radius = (radius - y) ** 2
-            in_bottom_radius = (y - (height - radius)) ** 2
-
-            for x in range(width):
-                left = (x < radius)
-                right = (x >= width - radius)
+                # Background inset, fill span, background inset
+                buf[start:end] = fill
+                buf[start:start + inset_bytes] = background[:inset_bytes]
+                buf[end - inset_bytes:end] = background[:inset_bytes]
+            
+            self.stream(buf[:(r1 - r0) * row_bytes])
+    
+    @traced('Kitty.draw_rounded_outline')
+    @micropython.native
+    def draw_rounded_outline(self, x, y, width, height, radius, color):
+        """Draw the one pixel outline of a box with rounded corners.
 
-                left_top = (left and top)
-                right_top = (right and top)
-                left_bottom = (left and bottom)
-                right_bottom = (right and bottom)
+        Args:
+            x (int): Starting X position.
+            y (int): Starting Y position.
+            width (int): Width of rectangle.
+            height (int): Height of rectangle.
+            radius (int): Corner radius.
+            color (int): RGB888 color value.
+        """
+        if self.display_list != None:
+            self.display_list.record(self.draw_rounded_outline, (x, y, width, height, radius, color),
+                                     x, y, x + width - 1, y + height - 1, False)
+            return
+        
+        radius = min(radius, width // 2, height // 2)
+        
+        if self.is_off_grid(x, y, x + width - 1, y + height - 1) or width == 0 or height == 0:
+            return
+        
+        insets = self.corner_insets(radius) if radius > 0 else b'\x00'
+        line = self.pool.fill(color, max(width, height))
+        x2 = x + width - 1
+        y2 = y + height - 1
+        
+        # Straight top and bottom edges
+        start = insets[0]
+        span = (width - start * 2) * 3
+        self.gpu.block(x + start, y, x2 - start, y, line[:span])
+        self.gpu.block(x + start, y2, x2 - start, y2, line[:span])
+        
+        # Arcs, from the end of the previous row's span to this row's inset
+        for row in range(1, radius):
+            inset = insets[row]
+            end = max(inset, insets[row - 1] - 1)
+            span = (end - inset + 1) * 3
+            
+            self.gpu.block(x + inset, y + row, x + end, y + row, line[:span])
+            self.gpu.block(x2 - end, y + row, x2 - inset, y + row, line[:span])
+            self.gpu.block(x + inset, y2 - row, x + end, y2 - row, line[:span])
+            self.gpu.block(x2 - end, y2 - row, x2 - inset, y2 - row, line[:span])
+        
+        # Straight left and right edges
+        side = height - max(radius, 1) * 2
+        
+        if side > 0:
+            top = y + max(radius, 1)
+            self.gpu.block(x, top, x, top + side - 1, line[:side * 3])
+            self.gpu.block(x2, top, x2, top + side - 1, line[:side * 3])
+    
+    def ellipse_extents(self, a, b):
+        """Return the half width of each row of an ellipse.
 
-                in_left_radius = (radius - x) ** 2
-                in_right_radius = ((width - radius) - x) ** 2
+        Args:
+            a (int): Semi axis horizontal.
+            b (int): Semi axis vertical.
+        Returns:
+            list: Half width for each row distance 0 to b from the center.
+        Note:
+            A pixel belongs to the ellipse if its center lies inside the
+            ellipse with both semi axes increased by half a pixel.
+        """
+        aa = (2 * a + 1) ** 2
+        bb = (2 * b + 1) ** 2
+        limit = aa * bb
+        extents = []
+        x = a
+        
+        for dy in range(b + 1):
+            while x > 0 and 4 * x * x * bb + 4 * dy * dy * aa > limit:
+                x -= 1
+            extents.append(x)
+        
+        return extents
+    
+    @micropython.native
+    def fill_spans(self, x0, y0, rows, color):
+        """Fill horizontal spans, merging rows that repeat the same spans.
 
-                if (
-                    left_top and in_left_radius + in_top_radius > square_radius or
-                    left_bottom and in_left_radius + in_bottom_radius > square_radius or
-                    
-                    right_top and in_right_radius + in_top_radius > square_radius or
-                    right_bottom and in_right_radius + in_bottom_radius > square_radius
-                ):                    
-                    offset = ((row + x) * 3)
-                    
-                    buf[offset]     = b_r
-                    buf[offset + 1] = b_g
-                    buf[offset + 2] = b_b
+        Args:
+            x0 (int): X coordinate span offsets are relative to.
+            y0 (int): Y coordinate of the first row.
+            rows (list): Tuple of (start, end) offsets for each row, inclusive.
+            color (int): RGB888 color value.
+        Note:
+            Spans are cropped to the screen, boxes crossing its edge are
+            dropped whole by draw_normal_box.
+        """
+        start = 0
+        count = len(rows)
+        x_max = self.display.width - 1
+        y_max = self.display.height - 1
+        
+        for row in range(1, count + 1):
+            if row < count and rows[row] == rows[start]:
+                continue
             
-            chunk_y += 1
+            # Rows start to row - 1 share the same spans
+            top = max(y0 + start, 0)
+            bottom = min(y0 + row - 1, y_max)
             
-        self.gpu.block(pos_x, pos_y, pos_x + width - 1, pos_y + height - 1, buf)
-    
-    def draw_circle_optmized(self, canvas_x, canvas_y, radius, color):
-        pass
+            if top <= bottom:
+                for first, last in rows[start]:
+                    left = max(x0 + first, 0)
+                    right = min(x0 + last, x_max)
+                    
+                    if left <= right:
+                        self.draw_normal_box(left, top, right - left + 1, bottom - top + 1, color)
+            
+            start = row
     
     @micropython.native
-    def draw_circle(self, canvas_x, canvas_y, radius, color):
-        threshold1 = radius
-        threshold2 = 0
-        x = radius
-        y = 0
-        
-        while(x >= y):
-            for i in range(2):
-                x = -x
-                for j in range(2):
-                    y = -y
-                    pos = (canvas_x + x, canvas_y + y)
-                    self.draw_pixel(pos[0], pos[1], color)
-                    self.draw_pixel(pos[1], pos[0], color)
-            
-            y += 1
-            threshold1 = threshold1 + y
-            threshold2 = threshold1 - x
-            
-            if threshold2 >= 0:
-                threshold1 = threshold2
-                x -= 1
+    def ellipse_rows(self, a, b, filled):
+        """Return the spans of each row of an ellipse, top to bottom."""
+        extents = self.ellipse_extents(a, b)
+        half = []
+        
+        for dy in range(b + 1):
+            outer = extents[dy]
             
-            #print('x, y: ', x, y, 'threshold: ', threshold1, threshold2, 'predict: ', (((1+(8*(-threshold2)))**(1/2))-1)/2)
-            #((n+1)*n)/2 = x
-            #((n+1)*n)/2 = 49
-            #49 = ((n-1)/n) ** 2
-            #49**(1/2) = (n-1)/n
-            #49**(1/2) * n = n - 1
-            #(49**(1/2))-1 * n = - 1
-            #N = (49**(1/2))-1) / -1
-            #(((1+(8*21))**(1/2))-1)/2
+            if filled or dy == b:
+                inner = 0
+            else:
+                inner = min(extents[dy + 1] + 1, outer)
             
-    @micropython.native
-    def draw_circle_alpha(self, x0, y0, r, color):
+            if inner == 0:
+                half.append(((-outer, outer),))
+            else:
+                half.append(((-outer, -inner), (inner, outer)))
+        
+        rows = half[:0:-1]
+        rows.extend(half)
+        return rows
+    
+    def draw_circle(self, x0, y0, r, color):
         """Draw a circle.
 
         Args:
@@ -362,32 +1146,24 @@ class Kitty():
             r (int): Radius.
             color (int): RGB888 color value.
         """
-        f = 1 - r
-        dx = 1
-        dy = -r - r
-        x = 0
-        y = r
-        self.draw_pixel(x0, y0 + r, color)
-        self.draw_pixel(x0, y0 - r, color)
-        self.draw_pixel(x0 + r, y0, color)
-        self.draw_pixel(x0 - r, y0, color)
-        while x < y:
-            if f >= 0:
-                y -= 1
-                dy += 2
-                f += dy
-            x += 1
-            dx += 2
-            f += dx
-            self.draw_pixel(x0 + x, y0 + y, color)
-            self.draw_pixel(x0 - x, y0 + y, color)
-            self.draw_pixel(x0 + x, y0 - y, color)
-            self.draw_pixel(x0 - x, y0 - y, color)
-            self.draw_pixel(x0 + y, y0 + x, color)
-            self.draw_pixel(x0 - y, y0 + x, color)
-            self.draw_pixel(x0 + y, y0 - x, color)
-            self.draw_pixel(x0 - y, y0 - x, color)
+        self.draw_ellipse(x0, y0, r, r, color)
+    
+    def draw_circle_alpha(self, x0, y0, r, color):
+        """Draw a circle, same as draw_circle."""
+        self.draw_ellipse(x0, y0, r, r, color)
+    
+    def fill_circle(self, x0, y0, r, color):
+        """Draw a filled circle.
 
+        Args:
+            x0 (int): X coordinate of center point.
+            y0 (int): Y coordinate of center point.
+            r (int): Radius.
+            color (int): RGB888 color value.
+        """
+        self.fill_ellipse(x0, y0, r, r, color)
+    
+    @traced('Kitty.draw_ellipse')
     def draw_ellipse(self, x0, y0, a, b, color):
         """Draw an ellipse.
 
@@ -402,51 +1178,29 @@ class Kitty():
             up to complete on a full pixel.  Therefore the major and
             minor axes are increased by 1.
         """
-        a2 = a * a
-        b2 = b * b
-        twoa2 = a2 + a2
-        twob2 = b2 + b2
-        x = 0
-        y = b
-        px = 0
-        py = twoa2 * y
-        # Plot initial points
-        self.draw_pixel(x0 + x, y0 + y, color)
-        self.draw_pixel(x0 - x, y0 + y, color)
-        self.draw_pixel(x0 + x, y0 - y, color)
-        self.draw_pixel(x0 - x, y0 - y, color)
-        # Region 1
-        p = round(b2 - (a2 * b) + (0.25 * a2))
-        while px < py:
-            x += 1
-            px += twob2
-            if p < 0:
-                p += b2 + px
-            else:
-                y -= 1
-                py -= twoa2
-                p += b2 + px - py
-            self.draw_pixel(x0 + x, y0 + y, color)
-            self.draw_pixel(x0 - x, y0 + y, color)
-            self.draw_pixel(x0 + x, y0 - y, color)
-            self.draw_pixel(x0 - x, y0 - y, color)
-        # Region 2
-        p = round(b2 * (x + 0.5) * (x + 0.5) +
-                  a2 * (y - 1) * (y - 1) - a2 * b2)
-        while y > 0:
-            y -= 1
-            py -= twoa2
-            if p > 0:
-                p += a2 - py
-            else:
-                x += 1
-                px += twob2
-                p += a2 - py + px
-            self.draw_pixel(x0 + x, y0 + y, color)
-            self.draw_pixel(x0 - x, y0 + y, color)
-            self.draw_pixel(x0 + x, y0 - y, color)
-            self.draw_pixel(x0 - x, y0 - y, color)
+        if self.display_list != None:
+            self.display_list.record(self.draw_ellipse, (x0, y0, a, b, color), x0 - a, y0 - b, x0 + a, y0 + b, False)
+            return
+        
+        self.fill_spans(x0, y0 - b, self.ellipse_rows(a, b, False), color)
+    
+    @traced('Kitty.fill_ellipse')
+    def fill_ellipse(self, x0, y0, a, b, color):
+        """Draw a filled ellipse.
 
+        Args:
+            x0, y0 (int): Coordinates of center point.
+            a (int): Semi axis horizontal.
+            b (int): Semi axis vertical.
+            color (int): RGB888 color value.
+        """
+        if self.display_list != None:
+            self.display_list.record(self.fill_ellipse, (x0, y0, a, b, color), x0 - a, y0 - b, x0 + a, y0 + b, False)
+            return
+        
+        self.fill_spans(x0, y0 - b, self.ellipse_rows(a, b, True), color)
+    
+    @traced('Kitty.draw_hline')
     def draw_hline(self, x, y, w, color):
         """Draw a horizontal line.
 
@@ -456,58 +1210,80 @@ class Kitty():
             w (int): Width of line.
             color (int): RGB888 color value.
         """
+        if self.display_list != None:
+            self.display_list.record(self.draw_hline, (x, y, w, color), x, y, x + w - 1, y, True, color)
+            return
+        
         if self.is_off_grid(x, y, x + w - 1, y):
             return
-        line = color.to_bytes(3, 'big') * w
+        line = self.pool.fill(color, w)
         self.gpu.block(x, y, x + w - 1, y, line)
     
+    @traced('Kitty.draw_bitmap')
     @micropython.native
     def draw_bitmap(self, path, x=0, y=0, w=None, h=None):
-        """Draw bitmap image from flash.
+        """Draw image from flash or SD card.
 
         Args:
-            path (string): Bitmap Image file path.
+            path (string): Raw image (.kri) or bitmap (.bmp) file path.
             x (int): X coordinate of image left. Default is 0.
             y (int): Y coordinate of image top. Default is 0.
             w (int): Width of image. If not informed, loads from file.
             h (int): Height of image. If not informed, loads from file.
+        Note:
+            Raw images are streamed to the display as they are read. Bitmaps
+            are converted row by row, which is much slower.
         """
         
         with open(path, "rb") as f:
-            if not w or not h:
-                f.seek(18)
-                w = ustruct.unpack('<i', f.read(4))[0]
-
-                f.seek(22)
-                h = ustruct.unpack('<i', f.read(4))[0]
+            image = open_image(f)
+            w = w or image.width
+            h = h or image.height
+            
+            if self.display_list != None:
+                self.display_list.record(self.draw_bitmap, (path, x, y, w, h), x, y, x + w - 1, y + h - 1, True)
+                return
             
             x2 = x + w - 1
             y2 = y + h - 1
             if self.is_off_grid(x, y, x2, y2):
-                f.close()
                 return
             
-            f.seek(54)
+            row_bytes = w * 3
             
-            chunk_height = 1024 // w
-            chunk_count, remainder = divmod(h, chunk_height)
-            chunk_size = chunk_height * w * 3
-            chunk_y = y + chunk_height * chunk_count
+            self.gpu.window(x, y, x2, y2)
             
-            if chunk_count:
-                for c in range(0, chunk_count):
-                    buf = bytearray(f.read(chunk_size))
-                    self.reverse(buf)
-                    self.gpu.block(x, chunk_y, x2, chunk_y + chunk_height - 1, buf)
+            if type(image) == RawImage:
+                # Stored in panel order, stream straight from the file
+                image.seek_row(0)
+                remaining = h * row_bytes
+                view = None
+                
+                while remaining > 0:
+                    view = self.stream_buffer(min(remaining, self.pool.size), view)
+                    
+                    # Whole pixels only, so any stand-in display can consume them
+                    size = len(view) - len(view) % 3
+                    count = f.readinto(view[:min(remaining, size)])
                     
-                    chunk_y -= chunk_height
+                    if not count:
+                        break
                     
-            if remainder:
-                buf = bytearray(remainder * w * 3)
-                self.reverse(buf)
-                self.gpu.block(x, chunk_y, x2, chunk_y + remainder - 1, buf)
+                    self.stream(view[:count])
+                    remaining -= count
+            else:
+                view = self.pool.scratch(self.pool.size)
                 
-            f.close()
+                if row_bytes > len(view):
+                    # Rows wider than the stream buffer
+                    view = memoryview(bytearray(row_bytes))
+                
+                chunk_height = self.planner.rows(row_bytes, h, len(view))
+                
+                for row in range(0, h, chunk_height):
+                    count = min(chunk_height, h - row)
+                    image.read_rows(row, count, view)
+                    self.gpu.write_data(view[:count * row_bytes])
     
     @micropython.native
     def draw_letter(self, x, y, letter, font, color, background=0, landscape=False, transparent=False):
@@ -522,38 +1298,82 @@ class Kitty():
             background (int): RGB888 background color (default: black).
             landscape (bool): Orientation (default: False = portrait)
         """
-        w, h = font.get_width_height(letter)
+        glyph = font.get_glyph(letter)
+        
+        # Check for errors (Font could be missing specified letter)
+        if glyph == None:
+            return 0, 0
+        
+        w = glyph.width
+        h = glyph.height
         
         if landscape:
             y -= w
-            block = {'x':x, 'y':y, 'x2':x + h - 1, 'y2':y + w - 1}
+            bw = h
+            bh = w
         else:
-            block = {'x':x, 'y':y, 'x2':x + w - 1, 'y2':y + h - 1}
+            bw = w
+            bh = h
         
-        if self.is_off_grid(block['x'], block['y'], block['x2'], block['y2']):
+        if self.is_off_grid(x, y, x + bw - 1, y + bh - 1):
             return 0, 0
         
-        pixels = list(font.get_letter(letter, landscape))
-        
-        
-        
-        # Check for errors (Font could be missing specified letter)
-        if len(pixels) == 0:
-            return w, h
+        pixels = glyph.pixels
+        self.glyphs += 1
         
         if transparent:
-            for pix in pixels:
-                self.draw_pixel(block['x']+pix[0], block['y']+pix[1], color)
+            self.draw_glyph_runs(x, y, glyph, font.cache.get_runs(glyph), color, landscape)
         else:
-            buf = bytearray(background.to_bytes(3, 'big') * w * h)
+            buf = self.pool.canvas(background, w * h)
+            c = self.pool.fill(color, 1)
             
-            for pix in pixels:
-                buf = self.set_buffer_pix(pix[0], pix[1], w, buf, color)
+            for i in range(0, len(pixels), 2):
+                if landscape:
+                    o = ((pixels[i] * bw) + h - 1 - pixels[i + 1]) * 3
+                else:
+                    o = ((pixels[i + 1] * bw) + pixels[i]) * 3
+                buf[o:o + 3] = c
             
-            self.gpu.block(block['x'], block['y'], block['x2'], block['y2'], buf)
+            self.gpu.block(x, y, x + bw - 1, y + bh - 1, buf)
         
         return w, h
     
+    @micropython.native
+    def draw_glyph_runs(self, x, y, glyph, runs, color, landscape):
+        """Draw the lit pixels of a glyph, one window per run.
+
+        Args:
+            x (int): Glyph block X position.
+            y (int): Glyph block Y position.
+            glyph (Glyph): Glyph to draw.
+            runs (bytes): Run list of the glyph.
+            color (int): RGB888 color value.
+            landscape (bool): Orientation (default: False = portrait)
+        """
+        view = self.pool.fill(color, max(glyph.width, glyph.height))
+        vertical = glyph.vertical_runs
+        gh = glyph.height - 1
+        
+        for i in range(0, len(runs), 3):
+            a = runs[i]
+            b = runs[i + 1]
+            n = runs[i + 2]
+            data = view[:n * 3]
+            
+            if vertical:
+                # Column a, rows b to b + n - 1
+                if landscape:
+                    self.gpu.block(x + gh - b - n + 1, y + a, x + gh - b, y + a, data)
+                else:
+                    self.gpu.block(x + a, y + b, x + a, y + b + n - 1, data)
+            else:
+                # Row a, columns b to b + n - 1
+                if landscape:
+                    self.gpu.block(x + gh - a, y + b, x + gh - a, y + b + n - 1, data)
+                else:
+                    self.gpu.block(x + b, y + a, x + b + n - 1, y + a, data)
+    
+    @traced('Kitty.draw_pixel')
     @micropython.native
     def draw_pixel(self, x, y, color):
         """Draw a single pixel.
@@ -563,11 +1383,16 @@ class Kitty():
             y (int): Y position.
             color (int): RGB888 color value.
         """
+        if self.display_list != None:
+            self.display_list.record(self.draw_pixel, (x, y, color), x, y, x, y, True, color)
+            return
+        
         if self.is_off_grid(x, y, x, y):
             return
         
-        self.gpu.block(x, y, x, y, color.to_bytes(3, 'big'))
+        self.gpu.block(x, y, x, y, self.pool.fill(color, 1))
     
+    @traced('Kitty.draw_text')
     @micropython.native
     def draw_text(self, x, y, text, font, color=Color.rgb(255, 255, 255),  background=Color.rgb(0, 0, 0), landscape=False, spacing=2, transparent=False):
         """Draw text.
@@ -582,7 +1407,134 @@ class Kitty():
             landscape (bool): Orientation (default: False = portrait)
             spacing (int): Pixels between letters (default: 1)
         """
-        cache = {}
+        if self.display_list != None:
+            total = self.measure_text(text, font, spacing)
+            
+            if landscape:
+                bounds = (x, y - total, x + font.height - 1, y - 1)
+            else:
+                bounds = (x, y, x + total - 1, y + font.height - 1)
+            
+            self.display_list.record(self.draw_text, (x, y, text, font, color, background, landscape, spacing, transparent),
+                                     bounds[0], bounds[1], bounds[2], bounds[3], not transparent)
+            return
+        
+        if transparent:
+            self.draw_text_letters(x, y, text, font, color, background, landscape, spacing, transparent)
+            return
+        
+        glyphs = []
+        total = 0
+        
+        for letter in text:
+            glyph = font.get_glyph(letter)
+            
+            # Stop on error
+            if glyph == None:
+                print('Invalid letter {0}'.format(letter))
+                return
+            
+            glyphs.append(glyph)
+            total += glyph.width + spacing
+        
+        if total == 0:
+            return
+        
+        h = font.height
+        
+        if landscape:
+            y -= total
+            w = h
+            h = total
+        else:
+            w = total
+        
+        if self.is_off_grid(x, y, x + w - 1, y + h - 1):
+            # Draw letter by letter so the visible part is still shown
+            if landscape:
+                y += total
+            self.draw_text_letters(x, y, text, font, color, background, landscape, spacing, transparent)
+            return
+        
+        self.glyphs += len(glyphs)
+        self.rasterize_text(x, y, w, h, glyphs, color, background, landscape, spacing)
+    
+    def measure_text(self, text, font, spacing):
+        """Return the length of text along its direction, spacing included."""
+        total = 0
+        
+        for letter in text:
+            w, h = font.get_width_height(letter)
+            total += w + spacing
+        
+        return total
+    
+    @micropython.native
+    def rasterize_text(self, x, y, w, h, glyphs, color, background, landscape, spacing):
+        """Rasterize a whole string and stream it in a single window.
+
+        Args:
+            x (int): Window X position.
+            y (int): Window Y position.
+            w (int): Window width.
+            h (int): Window height.
+            glyphs (list): Glyphs of the string, in drawing order.
+            color (int): RGB888 color value.
+            background (int): RGB888 background color.
+            landscape (bool): Orientation, glyphs advance upwards when True.
+            spacing (int): Pixels between letters.
+        """
+        row_bytes = w * 3
+        chunk_height = self.planner.rows(row_bytes, h, self.pool.size)
+        
+        background_rows = self.pool.fill(background, w * chunk_height)
+        c = self.pool.fill(color, 1)
+        nbytes = len(background_rows)
+        buf = None
+        
+        self.gpu.window(x, y, x + w - 1, y + h - 1)
+        
+        for r0 in range(0, h, chunk_height):
+            r1 = min(r0 + chunk_height, h)
+            buf = self.stream_buffer(nbytes, buf)
+            buf[:nbytes] = background_rows
+            
+            # Offset of each glyph along the text direction
+            offset = h if landscape else 0
+            
+            for glyph in glyphs:
+                pixels = glyph.pixels
+                gw = glyph.width
+                
+                if landscape:
+                    top = offset - gw
+                    offset = top - spacing
+                    
+                    if top + gw <= r0 or top >= r1:
+                        continue
+                    
+                    gh = glyph.height - 1
+                    for i in range(0, len(pixels), 2):
+                        row = top + pixels[i]
+                        
+                        if r0 <= row < r1:
+                            o = ((row - r0) * w + gh - pixels[i + 1]) * 3
+                            buf[o:o + 3] = c
+                else:
+                    for i in range(0, len(pixels), 2):
+                        row = pixels[i + 1]
+                        
+                        if r0 <= row < r1:
+                            o = ((row - r0) * w + offset + pixels[i]) * 3
+                            buf[o:o + 3] = c
+                    
+                    offset += gw + spacing
+            
+            self.stream(buf[:(r1 - r0) * row_bytes])
+    
+    @micropython.native
+    def draw_text_letters(self, x, y, text, font, color, background, landscape, spacing, transparent):
+        """Draw text one letter block at a time."""
         
         for letter in text:
             # Get letter array and letter dimensions
@@ -631,6 +1583,8 @@ class Kitty():
         
         return False
     
-    def clear(self, color = 0, lines = 8):
-        self.gpu.clear(color, lines)
+    @traced('Kitty.clear')
+    def clear(self, color = 0):
+        """Fill the whole display with color."""
+        self.draw_box(0, 0, self.gpu.width, self.gpu.height, color)
     
\ No newline at end of file
@@ -0,0 +1,117 @@
+from time import ticks_us, ticks_diff
+
+# Collector of the frame being drawn, None outside frames or when disabled
+active = None
+
+class FrameStats:
+    VISITED   = const(0)
+    REPAINTED = const(1)
+    PIXELS    = const(2)
+    WINDOWS   = const(3)
+    GLYPHS    = const(4)
+    US        = const(5)
+
+    def __init__(self, kitty, frames = 32, slow_ms = 50, report = 5):
+        """Per-frame render statistics with slow frame tracing.
+
+        Args:
+            kitty (Kitty): Graphics library the frames are drawn with.
+            frames (Optional int): Frames kept in the ring buffer (Default: 32).
+            slow_ms (Optional int): Frames taking longer are logged (Default: 50).
+            report (Optional int): Elements listed for a slow frame (Default: 5).
+        Note:
+            Each frame records elements visited and repainted, pixels and
+            windows sent to the display, glyphs drawn and wall time. While
+            a frame is measured every element draw is timed with its
+            children, and a slow frame prints the costliest subtrees.
+        """
+        self.kitty = kitty
+        self.ring = [None] * frames
+        self.index = 0
+        self.count = 0
+        self.slow_us = slow_ms * 1000
+        self.report = report
+        self.slow_frames = 0
+        self.elements = []
+
+    def gpu_counters(self):
+        stats = self.kitty.display.stats() if hasattr(self.kitty.display, 'stats') else {}
+        return stats.get('data_bytes', 0) // 3, stats.get('windows', 0)
+
+    def begin(self):
+        """Start measuring a frame."""
+        global active
+
+        self.visited = 0
+        self.repainted = 0
+        self.elements = []
+        self.start_pixels, self.start_windows = self.gpu_counters()
+        self.start_glyphs = self.kitty.glyphs
+        self.start = ticks_us()
+        active = self
+
+    def measure(self, element, gl):
+        """Paint an element tree, timing it with its children."""
+        start = ticks_us()
+        repainted = element.paint_tree(gl)
+
+        self.visited += 1
+
+        if repainted:
+            self.repainted += 1
+            self.elements.append((ticks_diff(ticks_us(), start), element.get_prop('id')))
+
+    def end(self):
+        """Finish the frame, store it and log it when slow."""
+        global active
+
+        active = None
+        us = ticks_diff(ticks_us(), self.start)
+        pixels, windows = self.gpu_counters()
+
+        frame = (self.visited, self.repainted, pixels - self.start_pixels, windows - self.start_windows,
+                 self.kitty.glyphs - self.start_glyphs, us)
+
+        self.ring[self.index] = frame
+        self.index = (self.index + 1) % len(self.ring)
+        self.count += 1
+
+        if us >= self.slow_us:
+            self.slow_frames += 1
+            self.log_slow(frame)
+
+        self.elements = []
+
+    def log_slow(self, frame):
+        print('Slow frame {0} ms: {1} visited, {2} repainted, {3} pixels, {4} windows, {5} glyphs'.format(
+            frame[self.US] // 1000, frame[self.VISITED], frame[self.REPAINTED], frame[self.PIXELS], frame[self.WINDOWS], frame[self.GLYPHS]))
+
+        # Subtree times include children, so parents come before the culprit
+        for us, id in sorted(self.elements, key=lambda element: -element[0])[:self.report]:
+            print('  {0:24} {1} us'.format(str(id), us))
+
+    def history(self):
+        """Return stored frames, oldest first, as (visited, repainted, pixels, windows, glyphs, us)."""
+        if self.count < len(self.ring):
+            return self.ring[:self.count]
+
+        return self.ring[self.index:] + self.ring[:self.index]
+
+    def summary(self):
+        """Return the average of the stored frames and the slow frame count."""
+        frames = self.history()
+        n = max(1, len(frames))
+        totals = [0] * 6
+
+        for frame in frames:
+            for i in range(6):
+                totals[i] += frame[i]
+
+        return {'frames': self.count,
+                'slow_frames': self.slow_frames,
+                'visited': totals[self.VISITED] // n,
+                'repainted': totals[self.REPAINTED] // n,
+                'pixels': totals[self.PIXELS] // n,
+                'windows': totals[self.WINDOWS] // n,
+                'glyphs': totals[self.GLYPHS] // n,
+                'us': totals[self.US] // n}
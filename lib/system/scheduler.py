@@ -0,0 +1,118 @@
+from time import ticks_us, ticks_ms, ticks_diff, sleep_ms
+import _thread
+
+class RenderScheduler:
+    def __init__(self, kitty, max_fps = 30):
+        """Draws documents only when one of their elements is invalidated.
+
+        Args:
+            kitty (Kitty): Graphics library the documents are drawn with.
+            max_fps (Optional int): Maximum frames per second (Default: 30).
+        Note:
+            run() sleeps on a lock until invalidate() releases it, so an
+            element marked from the touch path wakes the renderer at once.
+            Invalidations arriving while a frame is drawn, or while waiting
+            for the frame rate limit, are coalesced into the next frame.
+        """
+        self.kitty = kitty
+        self.documents = ()
+        self.min_frame_ms = 1000 // max_fps if max_fps else 0
+        self.running = False
+        self.on_error = None
+        self.on_frame = None
+        self.frame_stats = None
+
+        # Held while there is nothing to draw
+        self.wake = _thread.allocate_lock()
+        self.wake.acquire()
+        self.guard = _thread.allocate_lock()
+        self.last_frame = ticks_ms() - self.min_frame_ms
+
+        self.reset_stats()
+
+    def set_documents(self, *documents):
+        """Draw documents, in order, from the next frame on."""
+        for document in self.documents:
+            document.on_invalidate = None
+
+        for document in documents:
+            document.on_invalidate = self.invalidate
+
+        self.documents = documents
+        self.invalidate()
+
+    def invalidate(self):
+        """Request a frame, waking the renderer if it sleeps."""
+        with self.guard:
+            if self.wake.locked():
+                self.wake.release()
+
+    def run(self):
+        """Render frames until stop() is called."""
+        self.running = True
+
+        while self.running:
+            self.wake.acquire()
+
+            if not self.running:
+                break
+
+            # Later invalidations are drawn by this frame
+            wait = self.min_frame_ms - ticks_diff(ticks_ms(), self.last_frame)
+
+            if wait > 0:
+                sleep_ms(wait)
+
+            self.last_frame = ticks_ms()
+            self.frame()
+
+    def frame(self):
+        """Draw every document and end the frame."""
+        start = ticks_us()
+
+        if self.frame_stats != None:
+            self.frame_stats.begin()
+
+        try:
+            for document in self.documents:
+                document.draw(self.kitty)
+
+            self.kitty.flush()
+        except Exception as e:
+            if self.on_error == None:
+                raise
+
+            self.on_error(e)
+        finally:
+            if self.frame_stats != None:
+                self.frame_stats.end()
+
+        elapsed = ticks_diff(ticks_us(), start)
+        self.frames += 1
+        self.busy_us += elapsed
+        self.last_frame_us = elapsed
+        self.max_frame_us = max(self.max_frame_us, elapsed)
+
+        if self.on_frame != None:
+            self.on_frame()
+
+    def stop(self):
+        self.running = False
+        self.invalidate()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.busy_us = 0
+        self.last_frame_us = 0
+        self.max_frame_us = 0
+        self.stats_start = ticks_us()
+
+    def stats(self):
+        """Return frame times in microseconds and the idle share since the last reset."""
+        elapsed = max(1, ticks_diff(ticks_us(), self.stats_start))
+
+        return {'frames': self.frames,
+                'last_frame_us': self.last_frame_us,
+                'max_frame_us': self.max_frame_us,
+                'avg_frame_us': self.busy_us // max(1, self.frames),
+                'idle_percent': 100 - min(100, self.busy_us * 100 // elapsed)}
@@ -0,0 +1,128 @@
+from time import ticks_us, ticks_diff, ticks_ms
+from _thread import get_ident
+from config import DebugConf
+
+# (device, tag) -> [transactions, bytes, microseconds]
+counters = {}
+
+# Caller tag of each thread, set by traced()
+tags = {}
+
+last_dump = ticks_ms()
+
+class SpiTrace:
+    def __init__(self, spi, device):
+        """SPI bus wrapper counting the transfers of a device.
+
+        Args:
+            spi (SPI | SoftSPI): Bus to wrap.
+            device (string): Device name used in reports, e.g. 'gpu'.
+        Note:
+            Transfers are counted under the tag of the innermost traced()
+            function running on the calling thread. Use wrap(), which
+            returns the bus itself when tracing is disabled.
+        """
+        self.spi = spi
+        self.device = device
+
+    def __getattr__(self, name):
+        return getattr(self.spi, name)
+
+    def count(self, nbytes, start):
+        key = (self.device, tags.get(get_ident()))
+        counter = counters.get(key)
+
+        if counter == None:
+            counter = [0, 0, 0]
+            counters[key] = counter
+
+        counter[0] += 1
+        counter[1] += nbytes
+        counter[2] += ticks_diff(ticks_us(), start)
+
+    def write(self, data):
+        start = ticks_us()
+        self.spi.write(data)
+        self.count(len(data), start)
+
+    def read(self, nbytes, *args):
+        start = ticks_us()
+        data = self.spi.read(nbytes, *args)
+        self.count(nbytes, start)
+        return data
+
+    def readinto(self, buf, *args):
+        start = ticks_us()
+        self.spi.readinto(buf, *args)
+        self.count(len(buf), start)
+
+    def write_readinto(self, write_buf, read_buf):
+        start = ticks_us()
+        self.spi.write_readinto(write_buf, read_buf)
+        self.count(len(write_buf), start)
+
+def wrap(spi, device):
+    """Return spi traced as device, or spi itself when tracing is disabled."""
+    if not DebugConf.spi_trace:
+        return spi
+
+    return SpiTrace(spi, device)
+
+def traced(tag):
+    """Decorator counting the transfers made by a function under tag.
+
+    Note:
+        Returns the function untouched when tracing is disabled.
+    """
+    if not DebugConf.spi_trace:
+        return lambda function: function
+
+    def decorator(function):
+        def wrapper(*args, **kwargs):
+            ident = get_ident()
+            previous = tags.get(ident)
+            tags[ident] = tag
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tags[ident] = previous
+
+        return wrapper
+
+    return decorator
+
+def snapshot():
+    """Return {device: {tag: {'count', 'bytes', 'us'}}} since the last reset."""
+    result = {}
+
+    for key in counters:
+        count, nbytes, us = counters[key]
+        result.setdefault(key[0], {})[key[1]] = {'count': count, 'bytes': nbytes, 'us': us}
+
+    return result
+
+def reset():
+    counters.clear()
+
+def dump():
+    """Print the counters, busiest first."""
+    print('SPI trace')
+
+    for key in sorted(counters, key=lambda key: -counters[key][2]):
+        count, nbytes, us = counters[key]
+        print('  {0:8} {1:28} {2:7} tx {3:9} B {4:9} us'.format(key[0], str(key[1]), count, nbytes, us))
+
+def periodic():
+    """Dump and reset the counters every DebugConf.spi_trace_dump_ms."""
+    global last_dump
+
+    if not DebugConf.spi_trace:
+        return
+
+    now = ticks_ms()
+
+    if ticks_diff(now, last_dump) >= DebugConf.spi_trace_dump_ms:
+        last_dump = now
+        dump()
+        reset()
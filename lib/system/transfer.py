@@ -0,0 +1,261 @@
+import gc
+import time
+
+class SyncBackend:
+    def __init__(self, spi):
+        """Blocking transfers, used when no asynchronous backend is available.
+
+        Args:
+            spi (SPI): Bus to write to.
+        """
+        self.spi = spi
+
+    def start(self, data):
+        self.spi.write(data)
+
+    def busy(self):
+        return False
+
+    def wait(self):
+        pass
+
+class DmaBackend:
+    SPI_BASE = {0: 0x4003C000, 1: 0x40040000}
+    SPI_DREQ = {0: 16, 1: 18}
+    SSPDR = 0x08
+    SSPSR = 0x0C
+    SSPSR_RNE = 0x04
+    SSPSR_BSY = 0x10
+
+    def __init__(self, spi, number):
+        """RP2040 DMA transfers to a hardware SPI transmit FIFO.
+
+        Args:
+            spi (SPI): Configured hardware SPI, used to keep it alive.
+            number (int): Hardware SPI number, 0 or 1.
+        """
+        import rp2
+        from machine import mem32
+
+        self.spi = spi
+        self.mem32 = mem32
+        self.base = self.SPI_BASE[number]
+        self.dma = rp2.DMA()
+        self.ctrl = self.dma.pack_ctrl(size=0, inc_write=False, treq_sel=self.SPI_DREQ[number])
+        self.active = False
+
+    def start(self, data):
+        self.active = True
+        self.dma.config(read=data, write=self.base + self.SSPDR, count=len(data), ctrl=self.ctrl, trigger=True)
+
+    def busy(self):
+        if not self.active:
+            return False
+
+        if self.dma.active() or self.mem32[self.base + self.SSPSR] & self.SSPSR_BSY:
+            return True
+
+        # Drop what was clocked in while writing, like SPI.write does
+        while self.mem32[self.base + self.SSPSR] & self.SSPSR_RNE:
+            self.mem32[self.base + self.SSPDR]
+
+        self.active = False
+        return False
+
+    def wait(self):
+        while self.busy():
+            pass
+
+class ThreadBackend:
+    def __init__(self, spi):
+        """Transfers written by a worker thread, for hosts without DMA.
+
+        Args:
+            spi (SPI): Bus to write to, for example a SimulatedSpi.
+        Note:
+            Only used on the host. On the device the second core runs
+            the scheduler, and the rp2 port allows no further thread.
+        """
+        import _thread
+
+        self.spi = spi
+        self.data = None
+        self.work = _thread.allocate_lock()
+        self.idle = _thread.allocate_lock()
+        self.work.acquire()
+        _thread.start_new_thread(self.run, ())
+
+    def run(self):
+        while True:
+            self.work.acquire()
+            self.spi.write(self.data)
+            self.data = None
+            self.idle.release()
+
+    def start(self, data):
+        self.idle.acquire()
+        self.data = data
+        self.work.release()
+
+    def busy(self):
+        return self.idle.locked()
+
+    def wait(self):
+        self.idle.acquire()
+        self.idle.release()
+
+class SimulatedSpi:
+    def __init__(self, baudrate, target = None):
+        """SPI stand-in taking as long as a real bus to write.
+
+        Args:
+            baudrate (int): Simulated bus speed in bits per second.
+            target (Optional SPI): Bus that receives the data afterwards.
+        Note:
+            Sleeps take longer than asked. What a write overslept is
+            taken off the next write, so a stream of writes takes as long
+            as the bus would.
+        """
+        self.baudrate = baudrate
+        self.target = target
+        self.late = 0
+
+    def write(self, data):
+        wait = len(data) * 8_000_000 // self.baudrate - self.late
+
+        if wait > 0:
+            start = time.ticks_us()
+            time.sleep_us(wait)
+            self.late = time.ticks_diff(time.ticks_us(), start) - wait
+        else:
+            self.late = -wait
+
+        if self.target != None:
+            self.target.write(data)
+
+class TransferQueue:
+    def __init__(self, backend, count = 2, size = 3072):
+        """Rotating transfer buffers drained by a backend.
+
+        Args:
+            backend (SyncBackend | DmaBackend | ThreadBackend): Transfer backend.
+            count (Optional int): Number of buffers, at least 2 (Default: 2).
+            size (Optional int): Size of each buffer in bytes (Default: 3072).
+        Note:
+            Callers fill the buffer returned by acquire() and hand it to
+            submit(). Only one transfer runs at a time, so the buffer being
+            filled is never the one on the wire. wait() is the fence to use
+            before anything else touches the bus.
+        """
+        self.backend = backend
+        self.size = size - size % 3
+        self.buffers = [memoryview(bytearray(self.size)) for _ in range(max(2, count))]
+        self.index = 0
+        self.submitted = 0
+        self.waits = 0
+
+    def acquire(self):
+        """Return the next buffer to fill."""
+        return self.buffers[self.index]
+
+    def submit(self, data):
+        """Start sending data, a slice of the acquired buffer."""
+        if self.backend.busy():
+            self.waits += 1
+            self.backend.wait()
+
+        self.backend.start(data)
+        self.index = (self.index + 1) % len(self.buffers)
+        self.submitted += len(data)
+
+    def wait(self):
+        """Block until the last submitted transfer is done."""
+        self.backend.wait()
+
+    def busy(self):
+        return self.backend.busy()
+
+class ChunkPlanner:
+    def __init__(self, chunk_bytes = 3072, reserve = 16384, transient_chunks = 4):
+        """Sizes transfer buffers and splits drawing into chunks.
+
+        Args:
+            chunk_bytes (Optional int): Largest transfer buffer (Default: 3072).
+            reserve (Optional int): Heap bytes left free for everything else
+                (Default: 16384).
+            transient_chunks (Optional int): Chunks a temporary buffer, freed
+                right after use, may span (Default: 4).
+        Note:
+            Buffers get chunk_bytes when the heap allows it and shrink with
+            gc.mem_free() otherwise, never below the minimum the caller
+            needs, usually a display row. Rows are spread evenly over as
+            few chunks as the buffer allows, so larger buffers mean fewer
+            and larger windows.
+        """
+        self.chunk_bytes = chunk_bytes
+        self.reserve = reserve
+        self.transient_chunks = transient_chunks
+        self.shrunk = 0
+    
+    def free(self):
+        """Return free heap bytes, or None where the port does not tell."""
+        try:
+            return gc.mem_free()
+        except AttributeError:
+            return None
+    
+    def buffer_size(self, count = 1, minimum = 3, transient = False):
+        """Return the size of each of count buffers about to be allocated.
+
+        Args:
+            count (Optional int): Buffers allocated together (Default: 1).
+            minimum (Optional int): Smallest usable size (Default: 3).
+            transient (Optional bool): Buffers are freed right after use.
+        """
+        size = self.chunk_bytes
+        
+        if transient:
+            size *= self.transient_chunks
+        
+        free = self.free()
+        
+        if free != None and size * count > free - self.reserve:
+            size = max(0, free - self.reserve) // count
+            self.shrunk += 1
+        
+        size = max(size, minimum, 3)
+        return size - size % 3
+    
+    def rows(self, row_bytes, total, capacity):
+        """Return rows per chunk to send total rows through capacity bytes.
+
+        Args:
+            row_bytes (int): Bytes of one row.
+            total (int): Rows to send.
+            capacity (int): Bytes of the buffer used for each chunk.
+        """
+        per_chunk = max(1, min(total, capacity // max(1, row_bytes)))
+        chunks = (total + per_chunk - 1) // per_chunk
+        
+        # Even chunks instead of full ones and a small remainder
+        return (total + chunks - 1) // max(1, chunks)
+    
+    def allocate(self, size, minimum):
+        """Return a bytearray of size bytes, halving it down to minimum on MemoryError."""
+        while True:
+            try:
+                return bytearray(size)
+            except MemoryError:
+                if size <= minimum:
+                    raise
+                
+                gc.collect()
+                size = max(minimum, size // 2)
+                size -= size % 3
+                self.shrunk += 1
+    
+    def stats(self):
+        return {'chunk_bytes': self.chunk_bytes,
+                'reserve': self.reserve,
+                'free': self.free(),
+                'shrunk': self.shrunk}
@@ -1,6 +1,10 @@
 from lib.graphical.kitty import Color
+from lib.system import frame_stats
+from lib.ui.hit_grid import HitGrid
 
 class Position():
+    __slots__ = ('x', 'y', 'width', 'height')
+    
     def __init__(self, x, y, width, height):
         self.x      = x
         self.y      = y
@@ -10,35 +14,253 @@ class Position():
     def get_data(self):
         return self.x, self.y, self.width, self.height
 
+DAMAGE_RECTS = const(8)
+VISIBLE_RECTS = const(8)
+COVER_RECTS = const(16)
+
+class Damage(Position):
+    __slots__ = ('order',)
+    
+    def __init__(self, x, y, width, height, order = 0):
+        """Damaged screen rectangle.
+
+        Args:
+            order (Optional int): Paint order of the first element to repaint,
+                elements painted before it are covered there (Default: 0).
+        """
+        super().__init__(x, y, width, height)
+        self.order = order
+
+def damage_intersection(a, b):
+    """Return the overlap of two positions, or None."""
+    x0 = max(a.x, b.x)
+    y0 = max(a.y, b.y)
+    x1 = min(a.x + a.width, b.x + b.width)
+    y1 = min(a.y + a.height, b.y + b.height)
+    
+    if x1 <= x0 or y1 <= y0:
+        return None
+    
+    return Position(x0, y0, x1 - x0, y1 - y0)
+
+def damage_union(a, b):
+    x0 = min(a.x, b.x)
+    y0 = min(a.y, b.y)
+    x1 = max(a.x + a.width, b.x + b.width)
+    y1 = max(a.y + a.height, b.y + b.height)
+    
+    return Position(x0, y0, x1 - x0, y1 - y0)
+
+def rect_overlaps(a, b):
+    return a.x < b.x + b.width and b.x < a.x + a.width and a.y < b.y + b.height and b.y < a.y + a.height
+
+def rect_subtract(a, b):
+    """Return the parts of position a outside position b, at most four."""
+    inside = damage_intersection(a, b)
+    
+    if inside == None:
+        return [a]
+    
+    areas = []
+    right  = a.x + a.width
+    bottom = a.y + a.height
+    inside_right  = inside.x + inside.width
+    inside_bottom = inside.y + inside.height
+    
+    if inside.y > a.y:
+        areas.append(Position(a.x, a.y, a.width, inside.y - a.y))
+    
+    if inside_bottom < bottom:
+        areas.append(Position(a.x, inside_bottom, a.width, bottom - inside_bottom))
+    
+    if inside.x > a.x:
+        areas.append(Position(a.x, inside.y, inside.x - a.x, inside.height))
+    
+    if inside_right < right:
+        areas.append(Position(inside_right, inside.y, right - inside_right, inside.height))
+    
+    return areas
+
+def cover_add(covered, area):
+    """Add an opaque area to the occluders, keeping the COVER_RECTS largest.
+
+    Note:
+        Fewer occluders only means painting more, so the list is bounded
+        to keep culling linear in the number of elements.
+    """
+    size = area.width * area.height
+    smallest = 0
+    
+    for i in range(len(covered)):
+        cover = covered[i]
+        
+        if cover.x <= area.x and cover.y <= area.y and cover.x + cover.width >= area.x + area.width and cover.y + cover.height >= area.y + area.height:
+            return
+        
+        if cover.width * cover.height < covered[smallest].width * covered[smallest].height:
+            smallest = i
+    
+    if len(covered) < COVER_RECTS:
+        covered.append(area)
+    elif covered[smallest].width * covered[smallest].height < size:
+        covered[smallest] = area
+
+def damage_merge(a, b):
+    u = damage_union(a, b)
+    return Damage(u.x, u.y, u.width, u.height, min(a.order, b.order))
+
+def damage_add(damage, position, order = 0):
+    """Add a rectangle to a damage list, merging overlapping ones.
+
+    Args:
+        damage (list): Damage rectangles of the frame.
+        position (Position): Damaged screen rectangle.
+        order (Optional int): Paint order of the first element to repaint.
+    Note:
+        Overlapping rectangles are replaced by their bounds, so no pixel
+        is painted twice. Past DAMAGE_RECTS rectangles the new one is
+        merged into the one it grows least, bounding the per-element cost.
+    """
+    if position.width <= 0 or position.height <= 0:
+        return
+    
+    rect = Damage(position.x, position.y, position.width, position.height, order)
+    merged = True
+    
+    while merged:
+        merged = False
+        
+        for i in range(len(damage)):
+            if damage_intersection(damage[i], rect) != None:
+                rect = damage_merge(damage.pop(i), rect)
+                merged = True
+                break
+    
+    if len(damage) < DAMAGE_RECTS:
+        damage.append(rect)
+        return
+    
+    best = 0
+    best_cost = None
+    
+    for i in range(len(damage)):
+        a = damage[i]
+        x0 = min(a.x, rect.x)
+        y0 = min(a.y, rect.y)
+        x1 = max(a.x + a.width, rect.x + rect.width)
+        y1 = max(a.y + a.height, rect.y + rect.height)
+        cost = (x1 - x0) * (y1 - y0) - a.width * a.height
+        
+        if best_cost == None or cost < best_cost:
+            best = i
+            best_cost = cost
+    
+    # The grown rectangle may now overlap others, add it again
+    merged = damage_merge(damage.pop(best), rect)
+    damage_add(damage, merged, merged.order)
+
 class Element():
+    __slots__ = ('position', 'last_position', 'absolute_position', 'layout_parent', 'layout_dirty',
+                 'paint_order', 'damage', 'parent', 'children', 'properties', 'redraw_props',
+                 'needs_to_draw', 'on_invalidate', 'id', 'class_', 'color', 'redraw_color',
+                 'radius', 'touch_event', 'h_anchor', 'v_anchor', 'hit_cells', 'visible')
+    
+    # Properties kept in attributes, the rest go to the properties dict
+    FIELDS = {'id': 'id',
+              'class': 'class_',
+              'color': 'color',
+              'redraw_color': 'redraw_color',
+              'radius': 'radius',
+              'touch_event': 'touch_event',
+              'h_anchor': 'h_anchor',
+              'v_anchor': 'v_anchor'}
+    
+    # Properties that need the element drawn again, extended by subclasses
+    REDRAW_PROPS = ('redraw_color', 'radius', 'h_anchor', 'v_anchor')
+    
+    # Properties holding colours, kept as 24-bit ints
+    COLOR_PROPS = ('color', 'redraw_color', 'text_color', 'buttons_color')
+    
+    # Properties moving the element, its cached layout is computed again
+    LAYOUT_PROPS = ('h_anchor', 'v_anchor')
+    
+    # False for containers drawing nothing, uncovered areas get redraw_color
+    paints = True
+    
+    # True if every pixel of the bounds is painted, hiding what lies under
+    opaque = True
+    
     def __init__(self, position, id, class_ = None, properties = {}):
         self.position       = position
         self.last_position  = None
+        self.absolute_position = None
+        self.layout_parent  = None
+        self.layout_dirty   = True
+        self.paint_order    = 0
+        self.damage         = None
+        self.parent         = None
         self.children       = []
-        self.properties     = {'id':id,
-                               'class':class_,
-                               'redraw_color':'#000000',
-                               'radius': None,
-                               'touch_event':None,
-                               'h_anchor':'left',
-                               'v_anchor':'top'}
-        self.set_props(properties)
-        self.default_redraw_props = ['redraw_color', 'radius', 'h_anchor', 'v_anchor']
-        self.redraw_props   = []
+        self.properties     = None
+        self.redraw_props   = None
         self.needs_to_draw  = True
+        
+        # Called when an element of the tree needs drawing, set on the root
+        self.on_invalidate  = None
+        
+        self.id             = id
+        self.class_         = class_
+        self.color          = None
+        self.redraw_color   = 0x000000
+        self.radius         = None
+        self.touch_event    = None
+        self.h_anchor       = 'left'
+        self.v_anchor       = 'top'
+        self.hit_cells      = None
+        self.visible        = None
+        self.init_fields()
+        self.set_props(properties)
         self.on_load()
     
+    def init_fields(self):
+        """Set the defaults of the fields a subclass adds to FIELDS."""
+        pass
+    
     def get_redraw_props(self):
-        return self.default_redraw_props + self.redraw_props
+        return list(self.REDRAW_PROPS if self.redraw_props == None else self.redraw_props)
     
     def set_redraw_props(self, props):
-        self.redraw_props = props
+        """Redraw the element on props too, for this element only."""
+        self.redraw_props = Element.REDRAW_PROPS + tuple(props)
     
     def add_child(self, child):
+        child.parent = self
         self.children.append(child)
+        
+        if child.needs_to_draw:
+            self.invalidate()
 
     def remove_child(self, index):
-        return self.children.pop(index)
+        child = self.children.pop(index)
+        child.parent = None
+        
+        index = self.root().hit_index()
+        
+        # Uncover what the child was painted over
+        for element in child.walk():
+            if index != None:
+                index.remove(element)
+            
+            if element.last_position != None:
+                self.add_damage(element.last_position)
+                element.last_position = None
+        
+        return child
+    
+    def walk(self):
+        yield self
+        
+        for child in self.children:
+            yield from child.walk()
     
     def get_child(self, index):
         return self.children[index]
@@ -49,18 +271,21 @@ class Element():
     def calculate_relative_position(self, parent_position):
         x, y, width, height = parent_position.get_data()
         
-        if self.get_prop('h_anchor') == 'left':
+        h_anchor = self.h_anchor
+        v_anchor = self.v_anchor
+        
+        if h_anchor == 'left':
             x = self.position.x + x
-        elif self.get_prop('h_anchor') == 'right':
+        elif h_anchor == 'right':
             x = x + width - self.position.width - self.position.x
-        elif self.get_prop('h_anchor') == 'center':
+        elif h_anchor == 'center':
             x = x + ((width - self.position.width)//2)
         
-        if self.get_prop('v_anchor') == 'top':
+        if v_anchor == 'top':
             y = self.position.y + y
-        elif self.get_prop('v_anchor') == 'bottom':
+        elif v_anchor == 'bottom':
             y = y + height - self.position.height - self.position.y
-        elif self.get_prop('v_anchor') == 'center':
+        elif v_anchor == 'center':
             y = y + ((height - self.position.height)//2)
         
         width  = self.position.width
@@ -69,101 +294,283 @@ class Element():
         return Position(x, y, width, height)
     
     def areas_to_clear(self, position, last_position):
+        """Yield the parts of last_position that position no longer covers."""
         if last_position == None:
             return
         
-        left_x   = position.x
-        right_x  = position.x + position.width
-        top_y    = position.y
-        bottom_y = position.y + position.height
+        for area in rect_subtract(last_position, position):
+            yield area
+    
+    def draw_clear(self, gl, position, last_position):
+        for pos in self.areas_to_clear(position, last_position):
+            gl.draw_box(pos.x, pos.y, pos.width, pos.height, self.redraw_color)
+    
+    def draw(self, graphics_library, parent_position = Position(0, 0, 0, 0)):
+        """Repaint the damaged part of the tree rooted at this element.
+
+        Note:
+            Elements paint all of their bounds. One marked for redraw in
+            place damages its bounds from itself on in paint order, so what
+            it covers is not repainted. A moved or resized element also
+            damages its old bounds for everything. Only elements meeting the
+            damage are painted, so a change costs its own area instead of
+            its whole subtree. Within the damage, elements are then culled
+            front to back and each one is only painted, clipped, where no
+            opaque element painted after it covers it.
+        """
+        damage = self.take_damage()
+        uncovered = []
+        self.collect_damage(parent_position, damage, uncovered, 0, self.hit_index())
+        
+        if not len(damage):
+            return
+        
+        graphics_library.reset_clip()
         
-        last_left_x   = last_position.x
-        last_right_x  = last_position.x + last_position.width
-        last_top_y    = last_position.y
-        last_bottom_y = last_position.y + last_position.height
+        # Areas no ancestor repaints are cleared to the element's redraw_color
+        for element in uncovered:
+            element.draw_clear(graphics_library, element.absolute_position, element.last_position)
         
-        last_width = last_position.width
-        last_height = last_position.height
+        self.cull(damage, [])
+        self.paint(graphics_library)
+        graphics_library.reset_clip()
+    
+    def take_damage(self):
+        damage = self.damage if self.damage != None else []
+        self.damage = None
+        return damage
+    
+    def root(self):
+        element = self
+        
+        while element.parent != None:
+            element = element.parent
+        
+        return element
+    
+    def hit_index(self):
+        """Return the HitGrid of the touchable elements, kept by documents."""
+        return None
+    
+    def add_damage(self, position):
+        """Damage a screen rectangle of the tree, drawn on the next frame."""
+        element = self.root()
         
-        positions = []
+        if element.damage == None:
+            element.damage = []
         
-        if (left_x > last_right_x or top_y > last_bottom_y or right_x < last_left_x or bottom_y < last_top_y):
-            yield last_position
+        damage_add(element.damage, position)
+        element.invalidate()
+    
+    def collect_damage(self, parent_position, damage, uncovered, order, index):
+        """Lay the tree out and gather the bounds of changed elements.
+
+        Returns:
+            int: Paint order of the element following the subtree.
+        """
+        last = self.last_position
+        self.paint_order = order
+        
+        # Parents laid out again hand down a new position object
+        if self.layout_dirty or parent_position is not self.layout_parent:
+            position = self.calculate_relative_position(parent_position)
+            self.absolute_position = position
+            self.layout_parent = parent_position
+            self.layout_dirty = False
+            moved = last != None and position.get_data() != last.get_data()
+            
+            if index != None and (self.touch_event != None or self.hit_cells != None):
+                index.update(self)
         else:
-            x = 1
-            y = 1
-            width = 1
-            height = 1
+            position = self.absolute_position
+            moved = False
+        
+        if moved:
+            # Only the uncovered part needs what lies under the element
+            for area in self.areas_to_clear(position, last):
+                damage_add(damage, area)
             
-            if(left_x > last_left_x):
-                x = last_left_x
-                y = last_top_y
-                width = left_x - last_left_x
-                height = last_height
+            if not self.covered():
+                uncovered.append(self)
+            
+            self.needs_to_draw = True
+        
+        if self.needs_to_draw or last == None:
+            damage_add(damage, position, order)
+            self.unmark_for_redraw()
+        
+        order += 1
+        
+        for child in self.children:
+            order = child.collect_damage(position, damage, uncovered, order, index)
+        
+        return order
+    
+    def covered(self):
+        """Return True if an ancestor paints under the element."""
+        element = self.parent
+        
+        while element != None:
+            if element.paints:
+                return True
+            
+            element = element.parent
+        
+        return False
+    
+    def cull(self, damage, covered):
+        """Find, front to back, where each element of the tree shows in the damage.
+
+        Args:
+            damage (list): Damage rectangles of the frame.
+            covered (list): Damaged areas already hidden by opaque elements
+                painted later, grown as the tree is walked backwards.
+        """
+        children = self.children
+        
+        for i in range(len(children) - 1, -1, -1):
+            children[i].cull(damage, covered)
+        
+        self.visible = None
+        
+        if not self.paints:
+            return
+        
+        position = self.absolute_position
+        areas = None
+        
+        for area in damage:
+            if area.order > self.paint_order:
+                continue
+            
+            clip = damage_intersection(position, area)
+            
+            if clip != None:
+                if areas == None:
+                    areas = []
+                
+                areas.append(clip)
+        
+        if areas == None:
+            return
+        
+        visible = []
+        
+        for area in areas:
+            pieces = [area]
+            
+            for cover in covered:
+                if not rect_overlaps(area, cover):
+                    continue
                 
-                yield Position(x, y, width, height)
+                remaining = []
                 
-            elif(left_x < last_left_x):
-                x = right_x
-                y = last_top_y
-                width = last_right_x - right_x
-                height = last_height
+                for piece in pieces:
+                    if rect_overlaps(piece, cover):
+                        remaining.extend(rect_subtract(piece, cover))
+                    else:
+                        remaining.append(piece)
                 
-                yield Position(x, y, width, height)
-            
-            if(top_y > last_top_y):
-                x = last_left_x
-                y = last_top_y
-                width = last_width
-                height = top_y - last_top_y
+                pieces = remaining
                 
-                yield Position(x, y, width, height)
+                if not len(pieces):
+                    break
+            
+            if len(pieces) > VISIBLE_RECTS:
+                # Within its damaged area only, outside it nothing above repaints
+                bounds = pieces[0]
                 
-            elif(top_y < last_top_y):
-                x = left_x
-                y = bottom_y
-                width = last_width
-                height = last_bottom_y - bottom_y
+                for piece in pieces:
+                    bounds = damage_union(bounds, piece)
                 
-                yield Position(x, y, width, height)
-    
-    def draw_clear(self, gl, position, last_position):
-        for pos in self.areas_to_clear(position, last_position):
-            gl.draw_box(pos.x, pos.y, pos.width, pos.height, Color.hex(self.get_prop('redraw_color')))
-    
-    def draw(self, graphics_library, parent_position = Position(0, 0, 0, 0)):
-        redraw = self.needs_to_draw
-        relative_position = self.calculate_relative_position(parent_position)
+                pieces = [bounds]
+            
+            visible.extend(pieces)
         
-        if not redraw:
-            for child in self.get_children():
-                child.draw(graphics_library, relative_position)            
-            return
+        if len(visible):
+            self.visible = visible
         
-        print(self.get_prop('id'), relative_position.x, relative_position.y, relative_position.width, relative_position.height)
+        if self.opaque:
+            for area in areas:
+                cover_add(covered, area)
+    
+    def paint(self, gl):
+        if frame_stats.active != None:
+            frame_stats.active.measure(self, gl)
+        else:
+            self.paint_tree(gl)
+    
+    def paint_tree(self, gl):
+        """Paint the visible parts of the element, then its children.
+
+        Returns:
+            bool: True if the element painted.
+        """
+        position = self.absolute_position
+        visible = self.visible
         
-        self._draw(relative_position, graphics_library)
-        self.draw_clear(graphics_library, relative_position, self.last_position)
-        self.unmark_for_redraw()
+        if visible != None:
+            print(self.id, position.x, position.y, position.width, position.height)
+            
+            for clip in visible:
+                if clip.get_data() == position.get_data():
+                    gl.reset_clip()
+                else:
+                    gl.set_clip(clip.x, clip.y, clip.width, clip.height)
+                
+                self._draw(position, gl)
+            
+            self.visible = None
         
-        for child in self.get_children():
-            child.mark_for_redraw()
-            child.draw(graphics_library, relative_position)
+        self.last_position = position
         
-        self.draw_clear(graphics_library, relative_position, self.last_position)
-        self.last_position = Position(relative_position.x, relative_position.y, relative_position.width, relative_position.height)
+        for child in self.children:
+            child.paint(gl)
         
+        return visible != None
+    
     def mark_for_redraw(self):
         self.needs_to_draw = True
+        self.invalidate()
+    
+    def invalidate(self):
+        """Notify the handler of the tree root, waking the renderer."""
+        element = self.root()
+        
+        if element.on_invalidate != None:
+            element.on_invalidate()
     
     def unmark_for_redraw(self):        
         self.needs_to_draw = False
     
     def set_prop(self, property, value):
-        if (property in self.get_redraw_props()):
+        if property in self.COLOR_PROPS:
+            value = Color.parse(value)
+        
+        if property in self.LAYOUT_PROPS:
+            self.layout_dirty = True
+        
+        redraw_props = self.REDRAW_PROPS if self.redraw_props == None else self.redraw_props
+        
+        if property in redraw_props:
             self.mark_for_redraw()
-
-        self.properties[property] = value
+        
+        field = self.FIELDS.get(property)
+        
+        if field != None:
+            setattr(self, field, value)
+            
+            if property == 'touch_event' and self.absolute_position != None:
+                index = self.root().hit_index()
+                
+                if index != None:
+                    index.update(self)
+        else:
+            if self.properties == None:
+                self.properties = {}
+            
+            self.properties[property] = value
+        
         self._set_prop(property, value)
     
     def set_children_prop(self, property, value):
@@ -181,103 +588,166 @@ class Element():
             self.set_prop(prop, value)
 
     def get_prop(self, prop):
-        try:
-            return self.properties[prop]
-        except KeyError:
+        field = self.FIELDS.get(prop)
+        
+        if field != None:
+            return getattr(self, field)
+        
+        if self.properties == None:
             return None
         
+        return self.properties.get(prop)
+        
     def on_load(self):
         pass
 
     def set_x(self, x):
         self.position.x = x    
+        self.layout_dirty = True
         self.mark_for_redraw()
 
     def set_y(self, y):
         self.position.y = y
+        self.layout_dirty = True
         self.mark_for_redraw()
 
     def set_width(self, width):
         self.position.width = width
+        self.layout_dirty = True
         self.mark_for_redraw()
 
     def set_height(self, height):
         self.position.height = height
+        self.layout_dirty = True
         self.mark_for_redraw()
+    
+    def get_absolute_position(self, parent_position):
+        """Return the screen rectangle, the one last laid out when still valid."""
+        if self.layout_dirty or self.absolute_position == None:
+            return self.calculate_relative_position(parent_position)
+        
+        return self.absolute_position
         
     def check_touch(self, event, parent_position = None):
-        touch_event = self.properties['touch_event']
+        touch_event = self.touch_event
         
         x = event[0]
         y = event[1]
         
-        pos = self.calculate_relative_position(parent_position)
+        pos = self.get_absolute_position(parent_position)
         
         if x >= pos.x and x <= pos.x + pos.width and y >= pos.y and y <= pos.y + pos.height:
             if touch_event == None:
-                self.proc_touch_events(event, pos)
+                return self.proc_touch_events(event, pos)
             else:
                 touch_event(event)
                 return True
         return False
     
     def proc_touch_events(self, event, parent_position = None):
+        """Send a touch to the first child handling it, returns True if one did."""
         if parent_position == None:
             parent_position = self.position
         
         for child in self.children:
-            child.check_touch(event, parent_position)
+            if child.check_touch(event, parent_position):
+                return True
+        
+        return False
     
 class Document(Element):
+    __slots__ = ('grid',)
+    paints = False
+    opaque = False
+    
+    def init_fields(self):
+        self.grid = HitGrid(self.position, HitGrid.CELL_SIZE)
+    
+    def hit_index(self):
+        return self.grid
+    
+    def proc_touch_events(self, event, parent_position = None):
+        """Send a touch to the topmost element handling it, returns True if one did.
+
+        Note:
+            Elements are found in the document's HitGrid from their laid
+            out bounds, so only elements already drawn can be touched.
+        """
+        element = self.grid.hit(event[0], event[1])
+        
+        if element == None:
+            return False
+        
+        element.touch_event(event)
+        return True
+    
     def _draw(self, pos, gl):
         pass
     
     def get_by_id(self, id):
         for child in self.children:
-            if child.get_prop('id') == id:
+            if child.id == id:
                 return child
 
 class Div(Element):
-    def on_load(self):
-        self.set_redraw_props(['color', 'redraw_color'])
+    __slots__ = ()
+    REDRAW_PROPS = Element.REDRAW_PROPS + ('color',)
 
     def _draw(self, pos, gl):
         x = pos.x
         y = pos.y
         w = pos.width
         h = pos.height
-        c = Color.hex(self.get_prop('color'))
-        bc = Color.hex(self.get_prop('redraw_color'))
-        r  = self.get_prop('radius')
+        c = self.color
+        bc = self.redraw_color
+        r  = self.radius
         
         gl.draw_box(x, y, w, h, c, bc, r)
 
 class Text(Element):
-    def on_load(self):
-        self.set_redraw_props(['color', 'content', 'font'])
+    __slots__ = ('content', 'font', 'spacing')
+    FIELDS = dict(Element.FIELDS, content = 'content', font = 'font', spacing = 'spacing')
+    REDRAW_PROPS = Element.REDRAW_PROPS + ('color', 'content', 'font')
+    
+    def init_fields(self):
+        self.content = None
+        self.font = None
+        self.spacing = None
     
     def _draw(self, pos, gl):
         x = pos.x
         y = pos.y
-        text = self.get_prop('content')
-        font = self.get_prop('font')
-        color = Color.hex(self.get_prop('color'))
-        background = Color.hex(self.get_prop('redraw_color'))
+        text = self.content
+        font = self.font
+        color = self.color
+        background = self.redraw_color
         landscape = False
-        spacing = self.get_prop('spacing')
+        spacing = self.spacing
         transparent = False
         
         print(x, y, text, font, color, background, landscape, spacing, transparent)
         gl.draw_text(x, y, text, font, color, background, landscape, spacing, transparent)
     
-    def set_prop(self, property, value):
-        if property == 'content':
-            font = self.get_prop('font')
-            width, height = font.get_text_width_height(value)
+    def _set_prop(self, property, value):
+        if property in ('content', 'font', 'spacing'):
+            self.fit()
+    
+    def fit(self):
+        """Size the element to the text, spacing included, as draw_text paints it."""
+        font = self.font
+        text = self.content
+        
+        if font == None or text == None:
+            return
+        
+        width, height = font.get_text_width_height(text)
+        width += len(text) * (self.spacing or 0)
+        
+        if width != self.position.width:
             self.set_width(width)
+        
+        if height != self.position.height:
             self.set_height(height)
-            
-        super().set_prop(property, value)
     
 class Button(Element):
     def on_load(self):
@@ -326,8 +796,12 @@ class Button(Element):
         self.set_prop(self, property, value)
     
 class List(Element):
+    __slots__ = ('items',)
+    REDRAW_PROPS = Element.REDRAW_PROPS + ('color', 'buttons_color')
+    paints = False
+    opaque = False
+    
     def on_load(self):
-        self.set_redraw_props('color', 'buttons_color', 'redraw_color')
         self.items = []
         
     def _draw(self, pos, gl):
@@ -0,0 +1,111 @@
+class HitGrid:
+    CELL_SIZE = const(32)
+
+    def __init__(self, position, cell_size = 32):
+        """Uniform grid of the touchable elements of a document.
+
+        Args:
+            position (Position): Screen area of the document.
+            cell_size (Optional int): Cell width and height in pixels (Default: 32).
+        Note:
+            Elements with a touch_event are listed in every cell their
+            laid out bounds cover, so a touch only tests the elements of
+            one cell whatever the size of the tree. The renderer updates
+            the grid while touches are dispatched from another thread, so
+            cell lists are replaced instead of changed in place.
+        """
+
+        self.x = position.x
+        self.y = position.y
+        self.cell_size = cell_size
+        self.columns = max(1, (position.width + cell_size - 1) // cell_size)
+        self.rows = max(1, (position.height + cell_size - 1) // cell_size)
+        self.cells = [None] * (self.columns * self.rows)
+        self.count = 0
+
+    def cell_range(self, position):
+        """Return the first and last column and row covered by position, or None."""
+        size = self.cell_size
+        c0 = max(0, (position.x - self.x) // size)
+        r0 = max(0, (position.y - self.y) // size)
+        c1 = min(self.columns - 1, (position.x + position.width - self.x) // size)
+        r1 = min(self.rows - 1, (position.y + position.height - self.y) // size)
+
+        if c0 > c1 or r0 > r1:
+            return None
+
+        return c0, r0, c1, r1
+
+    def update(self, element):
+        """List an element at its laid out bounds, or drop it without a touch_event."""
+        self.remove(element)
+
+        if element.touch_event == None or element.absolute_position == None:
+            return
+
+        cells = self.cell_range(element.absolute_position)
+
+        if cells == None:
+            return
+
+        c0, r0, c1, r1 = cells
+
+        for row in range(r0, r1 + 1):
+            for column in range(c0, c1 + 1):
+                i = row * self.columns + column
+                cell = self.cells[i]
+                self.cells[i] = [element] if cell == None else cell + [element]
+
+        element.hit_cells = cells
+        self.count += 1
+
+    def remove(self, element):
+        """Drop an element from the grid."""
+        cells = element.hit_cells
+
+        if cells == None:
+            return
+
+        c0, r0, c1, r1 = cells
+
+        for row in range(r0, r1 + 1):
+            for column in range(c0, c1 + 1):
+                i = row * self.columns + column
+                cell = [other for other in self.cells[i] if other is not element]
+                self.cells[i] = cell if len(cell) else None
+
+        element.hit_cells = None
+        self.count -= 1
+
+    def hit(self, x, y):
+        """Return the topmost touchable element at a screen point, or None."""
+        column = (x - self.x) // self.cell_size
+        row = (y - self.y) // self.cell_size
+
+        if column < 0 or row < 0 or column >= self.columns or row >= self.rows:
+            return None
+
+        cell = self.cells[row * self.columns + column]
+
+        if cell == None:
+            return None
+
+        best = None
+
+        for element in cell:
+            pos = element.absolute_position
+
+            # Later elements in paint order are drawn on top
+            if x >= pos.x and x <= pos.x + pos.width and y >= pos.y and y <= pos.y + pos.height:
+                if best == None or element.paint_order > best.paint_order:
+                    best = element
+
+        return best
+
+    def stats(self):
+        cells = [cell for cell in self.cells if cell != None]
+
+        return {'elements': self.count,
+                'cells': len(self.cells),
+                'used_cells': len(cells),
+                'max_per_cell': max([len(cell) for cell in cells]) if len(cells) else 0}
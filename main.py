@@ -1,40 +1,20 @@
-from config import DisplayConf, AppsConf
-from lib.graphical.kitty import Kitty, Color
+from config import DisplayConf, AppsConf, KittyConf, DriversConf, DebugConf
+from lib.graphical.kitty import Kitty, Color, Font
 from lib.ui.chocolla import Document, Position
 from utils import DriverUtils, AppUtils
+from lib.system import spi_trace
+from lib.system.scheduler import RenderScheduler
+from lib.system.frame_stats import FrameStats
 import _thread
 
 #Load Drivers
-Gpu = DriverUtils.load('gpu', 'ILI9488', 'Gpu')
+Gpu = DriverUtils.load('gpu', DriversConf.gpu, 'Gpu')
 gpu = Gpu(DisplayConf.resolution, DisplayConf.rotation) # type: ignore
 battery = DriverUtils.load('battery', 'pico_vsys', 'Battery')
 sdcard = DriverUtils.load('storage', 'sdcard', 'SDCard')
 Touch  = DriverUtils.load('touch', 'xpt2046', 'Touch')
 touch = Touch() # type: ignore
 
-class GpuController:
-    def __init__(self, system):
-        self.system = system
-        self.running = False
-    
-    def start(self):
-        print('Starting GPU controller')
-        
-        self.running = True
-        while self.running:
-            self.system.status_document.draw(self.system.kitty_gl)
-            self.system.app_document.draw(self.system.kitty_gl)
-    
-        try:
-            pass
-        except Exception as e:
-            print('A critial error ocurred while rendering.')
-            print(e)
-            self.system.load_home_app()
-            
-    def stop(self):
-        self.running = False
-
 class System:
     def __init__(self, gpu, battery, sdcard, touch):
         self.started  = False
@@ -44,6 +24,22 @@ class System:
         self.sdcard   = sdcard
         self.touch    = touch
         self.kitty_gl = Kitty(gpu)
+        self.scheduler = RenderScheduler(self.kitty_gl, DisplayConf.max_fps)
+        self.scheduler.on_error = self.render_error
+        
+        if DebugConf.spi_trace:
+            self.scheduler.on_frame = spi_trace.periodic
+        
+        if DebugConf.frame_stats:
+            self.scheduler.frame_stats = FrameStats(self.kitty_gl, DebugConf.frame_stats_frames, DebugConf.slow_frame_ms)
+        
+        Font.cache.set_budget(KittyConf.glyph_cache_bytes)
+        
+        if KittyConf.display_list:
+            self.kitty_gl.enable_display_list()
+        
+        if KittyConf.compositor:
+            self.kitty_gl.enable_compositor(KittyConf.compositor_tile_width, KittyConf.compositor_tile_height, KittyConf.compositor_bytes)
         
         self.status_document = Document(Position(0, 0, 480, 30), 'status_doc')
         self.app_document    = Document(Position(0, 30, 480, 290), 'app_doc')
@@ -51,7 +47,7 @@ class System:
         self.load_home_app()
         self.load_status_bar()
         
-        self.gpu_controller = self.start_gpu_controller()
+        self.start_renderer()
         self.start_mainloop()
         
     def load_app(self, directory, name):
@@ -75,6 +71,7 @@ class System:
     def start_app(self, directory, app_name):
         print('Starting ' + app_name)
         self.app_document    = Document(Position(0, 30, 480, 290), 'app_doc')
+        self.scheduler.set_documents(self.status_document, self.app_document)
         self.running_app = self.load_app(directory, app_name)
         print(app_name + ' started')
     
@@ -90,10 +87,14 @@ class System:
     def get_status_document(self):
         return self.status_document
 
-    def start_gpu_controller(self):
-        gpu_controller = GpuController(self)
-        _thread.start_new_thread(gpu_controller.start, ())
-        return gpu_controller
+    def start_renderer(self):
+        print('Starting renderer')
+        _thread.start_new_thread(self.scheduler.run, ())
+    
+    def render_error(self, error):
+        print('A critial error ocurred while rendering.')
+        print(error)
+        self.load_home_app()
     
     def start_mainloop(self):
         self.started = True
@@ -103,8 +104,8 @@ class System:
             touch_event = self.touch.single_touch()
             
             if touch_event != None:
-                self.app_document.proc_touch_events(touch_event)
-                self.status_document.proc_touch_events(touch_event)
+                if not self.app_document.proc_touch_events(touch_event):
+                    self.status_document.proc_touch_events(touch_event)
                 
             self.status_bar.process(touch_event)
             self.running_app.process(touch_event)
@@ -9,7 +9,7 @@ r = lambda: random.randint(0,255)
 
 class MainScreen(BaseScreen):
     def on_start(self):
-        self.font = Font('./assets/fonts/ArcadePix9x11.cff', 9, 11)
+        self.font = Font('./assets/fonts/ArcadePix9x11.kbf')
         
         document = self.system.get_status_document()
         self.div_back = Div(Position(0, 0, 480, 30), 'background')
@@ -15,7 +15,7 @@ class MainScreen(BaseScreen):
         self.apps_list = self.system.get_installed_apps()
         self.app_icons = {}
         
-        self.font = Font('./assets/fonts/ArcadePix9x11.cff', 9, 11)
+        self.font = Font('./assets/fonts/ArcadePix9x11.kbf')
         document = self.system.get_app_document()
         self.div_back = Div(Position(0, 0, 480, 290), 'background')
         self.div_back.set_prop('color', '#01547a')
@@ -0,0 +1,162 @@
+"""Damaged, occluded chocolla trees must look like a full repaint.
+
+Runs on the host with CPython from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import host
+
+from config import DisplayConf, KittyConf
+from lib.graphical.kitty import Kitty, Font
+from lib.ui.chocolla import Document, Div, Text, Position
+from utils import DriverUtils
+
+with contextlib.redirect_stdout(io.StringIO()):
+    Gpu = DriverUtils.load('gpu', 'framebuffer', 'Gpu')
+
+FONT = Font('./assets/fonts/ArcadePix9x11.kbf')
+ANCHORS = ('left', 'right', 'center')
+V_ANCHORS = ('top', 'bottom', 'center')
+TEXT_WIDTH = 48
+TEXT_HEIGHT = 16
+
+
+def color(rng):
+    return rng.randint(0, 0xFFFFFF)
+
+
+def build(rng):
+    """Return a document with a full screen background and random layers over it.
+
+    Every element is kept inside its parent, so nothing reaches past the
+    screen edge, where Kitty drops a whole primitive that a clip would crop.
+    """
+    width, height = DisplayConf.resolution
+    document = Document(Position(0, 0, width, height), 'doc')
+    background = Div(Position(0, 0, width, height), 'background')
+    background.set_prop('color', color(rng))
+    document.add_child(background)
+    elements = []
+
+    def add(parent, depth):
+        bounds = parent.position
+
+        for i in range(rng.randint(3, 8)):
+            w = rng.randint(8, min(96, bounds.width - 8))
+            h = rng.randint(8, min(80, bounds.height - 8))
+            position = Position(rng.randint(0, bounds.width - w), rng.randint(0, bounds.height - h), w, h)
+
+            if depth and bounds.width >= TEXT_WIDTH and bounds.height >= TEXT_HEIGHT and rng.random() < 0.3:
+                position = Position(rng.randint(0, bounds.width - TEXT_WIDTH), rng.randint(0, bounds.height - TEXT_HEIGHT), 0, 0)
+                child = Text(position, 'text')
+                child.set_props({'color': color(rng), 'redraw_color': color(rng), 'font': FONT, 'content': 'Neko', 'spacing': 1})
+            else:
+                child = Div(position, 'div')
+                child.set_props({'color': color(rng), 'redraw_color': color(rng)})
+
+                if rng.random() < 0.3:
+                    child.set_prop('radius', rng.randint(3, 8))
+
+            child.set_prop('h_anchor', rng.choice(ANCHORS))
+            child.set_prop('v_anchor', rng.choice(V_ANCHORS))
+            parent.add_child(child)
+            elements.append(child)
+
+            if depth < 2 and isinstance(child, Div) and w >= 24 and h >= 24 and rng.random() < 0.6:
+                add(child, depth + 1)
+
+    add(background, 0)
+    return document, elements
+
+
+def change(rng, elements):
+    """Move, recolour or resize one element, keeping it inside its parent."""
+    element = rng.choice(elements)
+    bounds = element.parent.position
+    position = element.position
+    action = rng.randint(0, 2)
+
+    if action == 0:
+        element.set_x(min(max(0, position.x + rng.randint(-4, 4)), bounds.width - position.width))
+        element.set_y(min(max(0, position.y + rng.randint(-4, 4)), bounds.height - position.height))
+    elif action == 1:
+        element.set_prop('color', color(rng))
+    elif isinstance(element, Div) and not len(element.children):
+        element.set_width(min(max(4, position.width + rng.randint(-6, 6)), bounds.width - position.x))
+
+
+def full_repaint(element, gl, parent_position):
+    """Paint every element whole, back to front, without damage or culling."""
+    position = element.calculate_relative_position(parent_position)
+    element._draw(position, gl)
+
+    for child in element.children:
+        full_repaint(child, gl, position)
+
+
+def render(seed, mode):
+    rng = random.Random(seed)
+    document, elements = build(rng)
+    gpu = Gpu(DisplayConf.resolution)
+    kitty = Kitty(gpu)
+
+    if mode == 'compositor':
+        kitty.enable_compositor(KittyConf.compositor_tile_width, KittyConf.compositor_tile_height, KittyConf.compositor_bytes)
+    elif mode == 'display_list':
+        kitty.enable_display_list()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        document.draw(kitty)
+        kitty.flush()
+
+        # Several changes per frame leave separate damaged areas
+        for frame in range(6):
+            for step in range(5):
+                change(rng, elements)
+
+            document.draw(kitty)
+            kitty.flush()
+
+    reference = Gpu(DisplayConf.resolution)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        full_repaint(document, Kitty(reference), Position(0, 0, 0, 0))
+        reference.flush()
+
+    return gpu, reference
+
+
+class OcclusionTest(unittest.TestCase):
+    TREES = 40
+
+    def check(self, mode):
+        for seed in range(self.TREES):
+            gpu, reference = render(seed, mode)
+
+            if gpu.buffer != reference.buffer:
+                width = gpu.width
+                wrong = [i // 3 for i in range(0, len(gpu.buffer), 3) if gpu.buffer[i:i + 3] != reference.buffer[i:i + 3]]
+                self.fail('{0} tree {1}: {2} wrong pixels, first at x={3} y={4}'.format(
+                    mode, seed, len(wrong), wrong[0] % width, wrong[0] // width))
+
+    def test_plain(self):
+        self.check('plain')
+
+    def test_display_list(self):
+        self.check('display_list')
+
+    def test_compositor(self):
+        self.check('compositor')
+
+
+if __name__ == '__main__':
+    unittest.main()
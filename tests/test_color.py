@@ -0,0 +1,89 @@
+"""Colour memos must stay correct and bounded under random colour churn.
+
+Runs on the host with CPython from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import host
+
+from lib.graphical.kitty import Kitty, Color
+from lib.ui.chocolla import Document, Div, Position
+from utils import DriverUtils
+
+with contextlib.redirect_stdout(io.StringIO()):
+    Gpu = DriverUtils.load('gpu', 'framebuffer', 'Gpu')
+
+
+def random_hex(rng):
+    """Return a colour string as azuki's touch_clock makes them."""
+    return '#%02X%02X%02X' % (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255))
+
+
+class ColorTest(unittest.TestCase):
+    def test_hex(self):
+        rng = random.Random(1)
+
+        for i in range(200):
+            text = random_hex(rng)
+            self.assertEqual(Color.hex(text), int(text[1:], 16))
+            self.assertEqual(Color.hex(text[1:]), int(text[1:], 16))
+            self.assertEqual(Color.pattern(int(text[1:], 16)), bytes.fromhex(text[1:]))
+
+        self.assertEqual(Color.parse(None), None)
+        self.assertEqual(Color.parse(0x123456), 0x123456)
+
+    def test_bounded_lru(self):
+        rng = random.Random(2)
+        hot = '#003E5A'
+
+        for i in range(100):
+            Color.hex(hot)
+            Color.pattern(0x003E5A)
+
+            # Enough new colours to evict the oldest entry, but not a recently used one
+            for j in range(Color.CACHE_SIZE - 1):
+                Color.hex(random_hex(rng))
+                Color.pattern(rng.randint(0, 0xFFFFFF))
+
+            self.assertTrue(len(Color.values) <= Color.CACHE_SIZE)
+            self.assertTrue(len(Color.patterns) <= Color.CACHE_SIZE)
+            self.assertTrue(hot in Color.values)
+            self.assertTrue(0x003E5A in Color.patterns)
+
+    def test_element_churn(self):
+        rng = random.Random(3)
+        gpu = Gpu((480, 320))
+        kitty = Kitty(gpu)
+        document = Document(Position(0, 0, 480, 320), 'doc')
+        div = Div(Position(10, 10, 40, 20), 'clock')
+        document.add_child(div)
+
+        for i in range(300):
+            text = random_hex(rng)
+            div.set_prop('color', text)
+            div.set_prop('redraw_color', text)
+
+            # Stored parsed, drawn with the parsed colour
+            self.assertEqual(div.color, int(text[1:], 16))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                document.draw(kitty)
+                kitty.flush()
+
+            self.assertEqual(gpu.pixel(20, 20), int(text[1:], 16))
+
+        self.assertTrue(len(Color.values) <= Color.CACHE_SIZE)
+        self.assertTrue(len(Color.patterns) <= Color.CACHE_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""A flushed display list must draw what immediate drawing draws.
+
+Runs on the host with CPython from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import host
+
+from config import DisplayConf
+from lib.graphical.kitty import Kitty
+from lib.graphical.display_list import DisplayList
+from utils import DriverUtils
+
+with contextlib.redirect_stdout(io.StringIO()):
+    Gpu = DriverUtils.load('gpu', 'framebuffer', 'Gpu')
+
+# Few colours and a coarse grid, so fills cover, touch and merge
+COLORS = (0x000000, 0xFFFFFF, 0xFF0000, 0x00FF00)
+
+
+def scene(rng, kitty, count):
+    """Draw count random calls, with and without a clip."""
+    for i in range(count):
+        x = rng.randint(0, 23) * 20
+        y = rng.randint(0, 15) * 20
+        w = rng.randint(1, 6) * 20
+        h = rng.randint(1, 4) * 20
+        color = rng.choice(COLORS)
+        call = rng.randint(0, 9)
+
+        if rng.random() < 0.1:
+            kitty.set_clip(x, y, w, h)
+            x += rng.randint(-10, 10)
+            y += rng.randint(-10, 10)
+
+        if call < 5:
+            kitty.draw_box(x, y, w, h, color)
+        elif call == 5:
+            kitty.draw_box(x, y, w, h, color, rng.choice(COLORS), rng.randint(2, 8))
+        elif call == 6:
+            kitty.draw_hline(x, y, w, color)
+        elif call == 7:
+            kitty.draw_pixel(x, y, color)
+        elif call == 8:
+            kitty.draw_rounded_outline(x, y, w, h, rng.randint(0, 8), color)
+        else:
+            kitty.fill_ellipse(x + w // 2, y + h // 2, w // 2, h // 2, color)
+
+        kitty.reset_clip()
+
+
+def render(seed, count, display_list):
+    gpu = Gpu(DisplayConf.resolution)
+    kitty = Kitty(gpu)
+
+    if display_list:
+        kitty.enable_display_list()
+
+    scene(random.Random(seed), kitty, count)
+    kitty.flush()
+    return gpu, kitty
+
+
+class DisplayListTest(unittest.TestCase):
+    def compare(self, seed, count):
+        immediate = render(seed, count, False)[0]
+        gpu, kitty = render(seed, count, True)
+
+        self.assertTrue(gpu.buffer == immediate.buffer, 'seed {0}, {1} calls'.format(seed, count))
+        return kitty.display_list.stats()
+
+    def test_optimised(self):
+        dropped = 0
+        merged = 0
+
+        for seed in range(20):
+            stats = self.compare(seed, 120)
+            dropped += stats['dropped']
+            merged += stats['merged']
+
+        # The optimiser must have had something to do
+        self.assertTrue(dropped > 0)
+        self.assertTrue(merged > 0)
+
+    def test_replayed_above_limit(self):
+        stats = self.compare(1, DisplayList.MAX_OPS + 50)
+        self.assertEqual(stats['dropped'], 0)
+        self.assertEqual(stats['replayed'], stats['recorded'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Touches dispatched through the hit grid must reach what a tree walk finds.
+
+Runs on the host with CPython from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import host
+
+from lib.ui.chocolla import Document, Div, Position
+
+ANCHORS = ('left', 'right', 'center')
+V_ANCHORS = ('top', 'bottom', 'center')
+
+
+class NullGraphics:
+    """Accepts the calls elements make while drawing and draws nothing."""
+
+    def draw_box(self, x, y, width, height, color, bg_color = None, radius = None):
+        pass
+
+    def set_clip(self, x, y, width, height):
+        pass
+
+    def reset_clip(self):
+        pass
+
+
+class Touched:
+    """Touch handler remembering which element it belongs to."""
+
+    def __init__(self, log, element):
+        self.log = log
+        self.element = element
+
+    def __call__(self, event):
+        self.log.append(self.element)
+
+
+def build(rng, log):
+    document = Document(Position(0, 0, 480, 320), 'doc')
+    elements = []
+
+    def add(parent, depth):
+        for i in range(rng.randint(2, 6)):
+            w = rng.randint(8, 160)
+            h = rng.randint(8, 120)
+            child = Div(Position(rng.randint(-20, 400), rng.randint(-20, 260), w, h), 'div')
+            child.set_props({'color': 0xFFFFFF, 'h_anchor': rng.choice(ANCHORS), 'v_anchor': rng.choice(V_ANCHORS)})
+
+            if rng.random() < 0.6:
+                child.set_prop('touch_event', Touched(log, child))
+
+            parent.add_child(child)
+            elements.append(child)
+
+            if depth < 2 and rng.random() < 0.5:
+                add(child, depth + 1)
+
+    add(document, 0)
+    return document, elements
+
+
+def topmost(element, x, y, parent_position):
+    """Return the last element in paint order with a handler at x, y, laid out from scratch."""
+    found = None
+
+    for child in element.children:
+        pos = child.calculate_relative_position(parent_position)
+
+        if child.touch_event != None and x >= pos.x and x <= pos.x + pos.width and y >= pos.y and y <= pos.y + pos.height:
+            found = child
+
+        below = topmost(child, x, y, pos)
+
+        if below != None:
+            found = below
+
+    return found
+
+
+def change(rng, log, elements):
+    element = rng.choice(elements)
+    action = rng.randint(0, 3)
+
+    if action == 0:
+        element.set_x(element.position.x + rng.randint(-30, 30))
+        element.set_y(element.position.y + rng.randint(-30, 30))
+    elif action == 1:
+        element.set_width(max(1, element.position.width + rng.randint(-30, 30)))
+    elif action == 2:
+        element.set_prop('touch_event', None if element.touch_event != None else Touched(log, element))
+    elif element.parent != None:
+        removed = element.parent.remove_child(element.parent.children.index(element))
+
+        for child in removed.walk():
+            elements.remove(child)
+
+
+class HitGridTest(unittest.TestCase):
+    def check(self, rng, document, log):
+        for i in range(300):
+            x = rng.randint(0, 479)
+            y = rng.randint(0, 319)
+            expected = topmost(document, x, y, document.position)
+            del log[:]
+
+            self.assertEqual(document.proc_touch_events((x, y)), expected != None)
+            self.assertEqual(log, [] if expected == None else [expected], 'touch at {0}, {1}'.format(x, y))
+
+    def test_trees(self):
+        gl = NullGraphics()
+
+        for seed in range(20):
+            rng = random.Random(seed)
+            log = []
+            document, elements = build(rng, log)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                document.draw(gl)
+
+            self.check(rng, document, log)
+
+            # The grid follows moves, new handlers and removed elements
+            for step in range(5):
+                for i in range(4):
+                    if len(elements):
+                        change(rng, log, elements)
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    document.draw(gl)
+
+                self.check(rng, document, log)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,257 @@
+"""Windows drawn in a hardware scrolled area must show at their screen position.
+
+Runs on the host with CPython from the repository root:
+
+    python -m unittest discover tests
+
+The ILI9488 driver talks to a model of the panel through a stand-in
+machine module. The model follows the datasheet: memory writes land at
+CASET/PASET addresses, MADCTL MV and MY pick the scroll axis and its
+direction, and VSCRDEF/VSCRSADD pick the memory line each display line
+shows.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import types
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import host
+
+CASET = 0x2A
+PASET = 0x2B
+RAMWR = 0x2C
+VSCRDEF = 0x33
+MADCTL = 0x36
+VSCRSADD = 0x37
+ARG_BYTES = {CASET: 4, PASET: 4, VSCRDEF: 6, MADCTL: 1, VSCRSADD: 2}
+LINES = 480
+
+
+class Panel:
+    def __init__(self):
+        self.dc = 0
+        self.memory = None
+        self.command = None
+        self.args = bytearray()
+        self.columns = (0, 0)
+        self.pages = (0, 0)
+        self.cursor = 0
+        self.madctl = 0
+        self.scroll = (0, LINES, 0)
+        self.start = 0
+
+    def size(self, width, height):
+        self.width = width
+        self.height = height
+        self.memory = bytearray(width * height * 3)
+
+    def write(self, data):
+        if self.dc == 0:
+            for command in bytes(data):
+                self.command = command
+                self.args = bytearray()
+                self.cursor = 0
+        elif self.command == RAMWR:
+            self.store(bytes(data))
+        elif self.command in ARG_BYTES:
+            self.args.extend(data)
+
+            if len(self.args) == ARG_BYTES[self.command]:
+                self.apply(self.command, self.args)
+
+    def apply(self, command, args):
+        words = [(args[i] << 8) | args[i + 1] for i in range(0, len(args) - 1, 2)]
+
+        if command == CASET:
+            self.columns = tuple(words)
+        elif command == PASET:
+            self.pages = tuple(words)
+        elif command == VSCRDEF:
+            self.scroll = tuple(words)
+        elif command == VSCRSADD:
+            self.start = words[0]
+        elif command == MADCTL:
+            self.madctl = args[0]
+
+    def store(self, data):
+        x0, x1 = self.columns
+        y0, y1 = self.pages
+        columns = x1 - x0 + 1
+
+        for i in range(0, len(data) - 2, 3):
+            row, column = divmod(self.cursor, columns)
+            x = x0 + column
+            y = y0 + row
+            self.cursor += 1
+
+            if y <= y1 and x < self.width and y < self.height:
+                o = (y * self.width + x) * 3
+                self.memory[o:o + 3] = data[i:i + 3]
+
+    def shown(self, line):
+        """Return the memory address shown at a screen line of the scroll axis."""
+        reversed_lines = bool(self.madctl & 0x80)
+        top, count, bottom = self.scroll
+        physical = LINES - 1 - line if reversed_lines else line
+
+        if top <= physical < top + count:
+            physical = top + (self.start - top + physical - top) % count
+
+        return LINES - 1 - physical if reversed_lines else physical
+
+    def screen(self):
+        """Return the image on the display, RGB888 rows top to bottom."""
+        scroll_x = bool(self.madctl & 0x20)
+        image = bytearray(len(self.memory))
+        width = self.width
+
+        for y in range(self.height):
+            for x in range(width):
+                if scroll_x:
+                    o = (y * width + self.shown(x)) * 3
+                else:
+                    o = (self.shown(y) * width + x) * 3
+
+                image[(y * width + x) * 3:(y * width + x) * 3 + 3] = self.memory[o:o + 3]
+
+        return image
+
+
+PANEL = Panel()
+
+
+class Pin:
+    OUT = 1
+    pins = {}
+
+    def __init__(self, number, mode = None, value = 0):
+        self.number = number
+        self.value = value
+        Pin.pins[number] = self
+
+    def init(self, mode, value = 0):
+        self(value)
+
+    def __call__(self, value = None):
+        if value == None:
+            return self.value
+
+        self.value = value
+
+        if self.number == DC_PIN:
+            PANEL.dc = value
+
+
+class SPI:
+    def __init__(self, number, baudrate = 0, mosi = None, sck = None):
+        pass
+
+    def write(self, data):
+        PANEL.write(data)
+
+    def deinit(self):
+        pass
+
+
+machine = types.ModuleType('machine')
+machine.Pin = Pin
+machine.SPI = SPI
+sys.modules.setdefault('machine', machine)
+
+from drivers.gpu.ILI9488.config import SpiConf
+from lib.graphical.kitty import Kitty
+from utils import DriverUtils
+
+DC_PIN = SpiConf.dc
+
+with contextlib.redirect_stdout(io.StringIO()):
+    Gpu = DriverUtils.load('gpu', 'ILI9488', 'Gpu')
+
+
+class Screen:
+    """What the display should show, scrolled by moving lines."""
+
+    def __init__(self, width, height, scroll_x):
+        self.width = width
+        self.height = height
+        self.scroll_x = scroll_x
+        self.image = bytearray(width * height * 3)
+
+    def block(self, x0, y0, x1, y1, data):
+        i = 0
+
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                o = (y * self.width + x) * 3
+                self.image[o:o + 3] = data[i:i + 3]
+                i += 3
+
+    def scroll(self, top, count, lines):
+        old = bytes(self.image)
+
+        for line in range(top, top + count):
+            source = top + (line - top + lines) % count
+
+            if self.scroll_x:
+                for y in range(self.height):
+                    self.image[(y * self.width + line) * 3:(y * self.width + line) * 3 + 3] = old[(y * self.width + source) * 3:(y * self.width + source) * 3 + 3]
+            else:
+                self.image[line * self.width * 3:(line + 1) * self.width * 3] = old[source * self.width * 3:(source + 1) * self.width * 3]
+
+
+class ScrollTest(unittest.TestCase):
+    def run_rotation(self, rotation, resolution):
+        rng = random.Random(rotation)
+        width, height = resolution
+        PANEL.size(width, height)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            gpu = Gpu(resolution, rotation)
+
+        kitty = Kitty(gpu)
+        screen = Screen(width, height, gpu.scroll_x)
+        top = rng.randint(0, 60)
+        bottom = rng.randint(0, 60)
+        gpu.set_scroll_area(top, bottom)
+        count = (width if gpu.scroll_x else height) - top - bottom
+
+        for step in range(6):
+            lines = rng.randint(-count + 1, count - 1)
+            gpu.scroll(lines)
+            screen.scroll(top, count, lines)
+
+            for i in range(4):
+                w = rng.randint(1, 120)
+                h = rng.randint(1, 120)
+                x = rng.randint(0, width - w)
+                y = rng.randint(0, height - h)
+
+                if i % 2:
+                    data = bytes(rng.randint(0, 255) for j in range(w * h * 3))
+                    gpu.block(x, y, x + w - 1, y + h - 1, data)
+                else:
+                    color = rng.randint(0, 0xFFFFFF)
+                    data = color.to_bytes(3, 'big') * (w * h)
+                    kitty.draw_box(x, y, w, h, color)
+
+                screen.block(x, y, x + w - 1, y + h - 1, data)
+
+            kitty.flush()
+            self.assertTrue(PANEL.screen() == screen.image, 'rotation {0}, step {1}'.format(rotation, step))
+
+    def test_landscape(self):
+        self.run_rotation(90, (480, 320))
+        self.run_rotation(270, (480, 320))
+
+    def test_portrait(self):
+        self.run_rotation(0, (320, 480))
+        self.run_rotation(180, (320, 480))
+
+
+if __name__ == '__main__':
+    unittest.main()
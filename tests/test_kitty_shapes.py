@@ -0,0 +1,69 @@
+"""Shapes crossing the screen edge must keep their visible part.
+
+Runs on the host with CPython from the repository root:
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+
+import host
+
+from config import DisplayConf
+from lib.graphical.kitty import Kitty
+from utils import DriverUtils
+
+with contextlib.redirect_stdout(io.StringIO()):
+    Gpu = DriverUtils.load('gpu', 'framebuffer', 'Gpu')
+
+COLOR = 0xFF8000
+
+
+def drawn(shape, *args):
+    """Return the set of pixels a shape sets on a black screen."""
+    gpu = Gpu(DisplayConf.resolution)
+    kitty = Kitty(gpu)
+    getattr(kitty, shape)(*args, COLOR)
+    kitty.flush()
+
+    buffer = gpu.buffer
+    return set((i // 3 % gpu.width, i // 3 // gpu.width) for i in range(0, len(buffer), 3) if buffer[i:i + 3] != b'\x00\x00\x00')
+
+
+class EdgeTest(unittest.TestCase):
+    def check(self, shape, x, y, size):
+        """Compare a shape centered at x, y with the same shape on screen, moved and cropped."""
+        width, height = DisplayConf.resolution
+        cx = min(max(x, 60), width - 60)
+        cy = min(max(y, 60), height - 60)
+        whole = drawn(shape, cx, cy, *size)
+        expected = set((px + x - cx, py + y - cy) for px, py in whole)
+        expected = set((px, py) for px, py in expected if 0 <= px < width and 0 <= py < height)
+
+        self.assertTrue(len(expected))
+        self.assertEqual(drawn(shape, x, y, *size), expected)
+
+    def test_fill_circle(self):
+        self.check('fill_circle', 2, 50, (10,))
+        self.check('fill_circle', 475, 316, (10,))
+
+    def test_draw_circle(self):
+        self.check('draw_circle', 2, 50, (10,))
+        self.check('draw_circle', 100, 3, (10,))
+
+    def test_fill_ellipse(self):
+        self.check('fill_ellipse', 5, 100, (20, 10))
+        self.check('fill_ellipse', 200, 315, (20, 10))
+
+    def test_draw_ellipse(self):
+        self.check('draw_ellipse', 5, 100, (20, 10))
+        self.check('draw_ellipse', 470, 2, (20, 10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""Measure the heap cost, draw and touch speed of chocolla element trees.
+
+Runs on the host with CPython from the repository root, or on the device
+with MicroPython:
+
+    python tools/element_memory.py [--elements 500]
+
+A document is filled with Div elements, each holding a Text, and the
+bytes allocated per element are reported, from tracemalloc on CPython and
+gc.mem_alloc() on MicroPython. set_prop() and a full repaint traversal
+are timed with a graphics library that draws nothing, so only the tree
+costs are measured. Every Div handles touches, and dispatch through the
+document's hit grid is timed against walking the tree.
+"""
+import gc
+import sys
+
+try:
+    import os
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import host
+except ImportError:
+    pass
+
+from time import ticks_us, ticks_diff
+from lib.graphical.kitty import Font
+from lib.ui.chocolla import Element, Document, Div, Text, Position
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class NullGraphics:
+    """Accepts the calls elements make while drawing and draws nothing."""
+
+    def draw_box(self, x, y, width, height, color, bg_color = None, radius = None):
+        pass
+
+    def draw_text(self, x, y, text, font, color, background, landscape, spacing, transparent):
+        pass
+
+    def set_clip(self, x, y, width, height):
+        pass
+
+    def reset_clip(self):
+        pass
+
+
+def allocated():
+    if tracemalloc != None:
+        return tracemalloc.get_traced_memory()[0]
+
+    gc.collect()
+    return gc.mem_alloc()
+
+
+def touched(event):
+    pass
+
+
+def build(document, count, font):
+    for i in range(count):
+        div = Div(Position(i % 40 * 12, i // 40 % 26 * 12, 10, 10), 'div{0}'.format(i))
+        div.set_props({'color': '#FFFFFF', 'redraw_color': '#000000', 'touch_event': touched})
+        document.add_child(div)
+
+        text = Text(Position(0, 0, 0, 0), 'text{0}'.format(i))
+        text.set_props({'color': '#000000', 'redraw_color': '#FFFFFF', 'font': font, 'content': 'a', 'spacing': 1, 'h_anchor': 'center', 'v_anchor': 'center'})
+        div.add_child(text)
+
+
+def run(count):
+    font = Font('./assets/fonts/ArcadePix9x11.kbf')
+    gl = NullGraphics()
+    document = Document(Position(0, 0, 480, 320), 'doc')
+
+    # Ids are allocated either way, keep them out of the element cost
+    ids = ['div{0}'.format(i) for i in range(count)] + ['text{0}'.format(i) for i in range(count)]
+
+    if tracemalloc != None:
+        tracemalloc.start()
+
+    gc.collect()
+    before = allocated()
+    build(document, count, font)
+    gc.collect()
+    used = allocated() - before
+
+    elements = count * 2
+    print('{0} elements: {1} bytes, {2} bytes per element'.format(elements, used, used // elements))
+
+    if tracemalloc != None:
+        tracemalloc.stop()
+
+    # Printed positions would dominate the traversal time
+    import builtins
+    quiet = lambda *args, **kwargs: None
+    real_print = builtins.print
+    builtins.print = quiet
+
+    try:
+        start = ticks_us()
+        document.draw(gl)
+        first = ticks_diff(ticks_us(), start)
+
+        start = ticks_us()
+        document.draw(gl)
+        steady = ticks_diff(ticks_us(), start)
+
+        start = ticks_us()
+        for child in document.children:
+            child.set_prop('color', 0x123456)
+        set_prop = ticks_diff(ticks_us(), start)
+
+        start = ticks_us()
+        document.draw(gl)
+        repaint = ticks_diff(ticks_us(), start)
+    finally:
+        builtins.print = real_print
+
+    print('first draw: {0} us, clean draw: {1} us, repaint after set_prop: {2} us'.format(first, steady, repaint))
+    print('set_prop: {0} us per call'.format(set_prop / count))
+
+    touches = [(i * 7 % 480, i * 13 % 320) for i in range(200)]
+
+    start = ticks_us()
+    for event in touches:
+        document.proc_touch_events(event)
+    grid = ticks_diff(ticks_us(), start)
+
+    start = ticks_us()
+    for event in touches:
+        Element.proc_touch_events(document, event)
+    walk = ticks_diff(ticks_us(), start)
+
+    print('touch: {0} us per event with the hit grid, {1} us walking the tree'.format(grid / len(touches), walk / len(touches)))
+
+    return 0
+
+
+def main(argv):
+    count = 500
+
+    if len(argv) > 1 and argv[0] == '--elements':
+        count = int(argv[1])
+
+    return run(count)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
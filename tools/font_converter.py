@@ -0,0 +1,89 @@
+"""Convert X-GLCD text fonts (.cff) to the Kitty binary font format (.kbf).
+
+Runs on the host with CPython:
+
+    python tools/font_converter.py assets/fonts/ArcadePix9x11.cff 9 11
+
+Binary layout (little endian):
+    header   magic b'KBF', version (u8), width (u8), height (u8),
+             start letter (u16), letter count (u16)
+    widths   letter count bytes, the width in columns of every glyph
+    bitmaps  glyph columns packed back to back, each column using
+             ceil(height / 8) bytes, least significant bit on top
+"""
+import struct
+import sys
+
+MAGIC   = b'KBF'
+VERSION = 1
+HEADER  = '<3sBBBHH'
+
+
+def read_cff(path, width, height):
+    """Read an X-GLCD font.
+
+    Args:
+        path (string): Path of the .cff file.
+        width (int): Maximum glyph width of the font.
+        height (int): Glyph height of the font.
+    Returns:
+        list: (width, column bytes) for every glyph in the file.
+    """
+    byte_height = (height + 7) // 8
+    glyphs = []
+
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            record = bytes(int(b, 16) for b in line.split(','))
+            glyph_width = record[0]
+
+            if glyph_width > width:
+                raise ValueError('Glyph {0} is wider than the font width'.format(len(glyphs)))
+
+            glyphs.append((glyph_width, record[1:1 + glyph_width * byte_height]))
+
+    return glyphs
+
+
+def write_kbf(path, glyphs, width, height, start_letter=32):
+    """Write glyphs in the Kitty binary font format.
+
+    Args:
+        path (string): Destination .kbf path.
+        glyphs (list): (width, column bytes) for every glyph.
+        width (int): Maximum glyph width of the font.
+        height (int): Glyph height of the font.
+        start_letter (int): Code point of the first glyph.
+    """
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER, MAGIC, VERSION, width, height, start_letter, len(glyphs)))
+        f.write(bytes(w for w, _ in glyphs))
+
+        for _, columns in glyphs:
+            f.write(columns)
+
+
+def main(args):
+    if len(args) < 3:
+        print('Usage: font_converter.py <font.cff> <width> <height> [start_letter] [output.kbf]')
+        return 1
+
+    source = args[0]
+    width = int(args[1])
+    height = int(args[2])
+    start_letter = int(args[3]) if len(args) > 3 else 32
+    target = args[4] if len(args) > 4 else source.rsplit('.', 1)[0] + '.kbf'
+
+    glyphs = read_cff(source, width, height)
+    write_kbf(target, glyphs, width, height, start_letter)
+    print('Wrote {0} glyphs to {1}'.format(len(glyphs), target))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
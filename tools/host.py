@@ -0,0 +1,49 @@
+"""Let NekoOS modules run under CPython on the host.
+
+MicroPython provides const() as a builtin, the micropython module for the
+code emitter decorators, ustruct and the time.ticks functions. Importing
+this module installs plain Python equivalents when they are missing, and
+puts the repository root on the import path, so host tools can import lib
+and drivers unchanged:
+
+    import host  # before any NekoOS import
+"""
+import builtins
+import os
+import struct
+import sys
+import time
+import types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def install():
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    if not hasattr(builtins, 'const'):
+        builtins.const = lambda value: value
+
+    if 'micropython' not in sys.modules:
+        micropython = types.ModuleType('micropython')
+        micropython.const = builtins.const
+        micropython.native = lambda function: function
+        micropython.viper = lambda function: function
+        sys.modules['micropython'] = micropython
+
+    # Decorators are used without importing the module on the device
+    if not hasattr(builtins, 'micropython'):
+        builtins.micropython = sys.modules['micropython']
+
+    sys.modules.setdefault('ustruct', struct)
+
+    if not hasattr(time, 'ticks_us'):
+        time.ticks_us = lambda: time.perf_counter_ns() // 1000
+        time.ticks_ms = lambda: time.perf_counter_ns() // 1000000
+        time.ticks_diff = lambda end, start: end - start
+        time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+
+install()
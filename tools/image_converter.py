@@ -0,0 +1,49 @@
+"""Convert bitmaps (.bmp) to the Kitty raw image format (.kri).
+
+Runs on the host with CPython from the repository root:
+
+    python tools/image_converter.py wallpaper.bmp [wallpaper.kri]
+
+Raw images are streamed to the display by Kitty.draw_bitmap without any
+conversion, see lib/graphical/image.py for the layout.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lib.graphical.image import BmpImage, RawImage
+
+
+def convert(source, target):
+    with open(source, 'rb') as f:
+        image = BmpImage(f)
+        row = bytearray(image.width * 3)
+
+        def rows():
+            for y in range(image.height):
+                image.read_rows(y, 1, row)
+                yield row
+
+        with open(target, 'wb') as out:
+            RawImage.write(out, image.width, image.height, rows())
+
+    return image.width, image.height
+
+
+def main(args):
+    if len(args) < 1:
+        print('Usage: image_converter.py <image.bmp> [output.kri]')
+        return 1
+
+    source = args[0]
+    target = args[1] if len(args) > 1 else source.rsplit('.', 1)[0] + '.kri'
+
+    width, height = convert(source, target)
+    print('Wrote {0}x{1} image to {2}'.format(width, height, target))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
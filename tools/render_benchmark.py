@@ -0,0 +1,193 @@
+"""Render the system apps headless and report frame times and bus costs.
+
+Runs on the host with CPython from the repository root:
+
+    python tools/render_benchmark.py [--frames 30] [--display-list]
+                                     [--compositor] [--dump frame.png]
+                                     [--frame-stats] [--slow-ms 50]
+                                     [--overlap]
+
+The status bar and home apps are loaded into their documents as on the
+device and drawn on the framebuffer display driver. Every frame touches
+the clock, as a user would, so part of the screen is redrawn. Bus time
+comes from the driver's cost model, see drivers/gpu/framebuffer/config.py.
+
+With --overlap the frames are drawn twice over a simulated bus that takes
+as long as the modelled one, once with blocking transfers and once with
+the thread backend, which sends a chunk while the next one is drawn.
+Drawing only overlaps the bus where a frame has CPU work to hide. The
+frames here are mostly bus time, and on CPython handing a chunk to the
+worker costs about what the overlap saves, so expect no gain on the host.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import host
+
+from config import DisplayConf, AppsConf, KittyConf
+from lib.graphical.kitty import Kitty, Font
+from lib.ui.chocolla import Document, Position
+from lib.system.frame_stats import FrameStats
+from utils import DriverUtils, AppUtils
+
+
+class HostBattery:
+    def measure(self):
+        return 75, 3.9
+
+
+class HostSystem:
+    """Just enough of main.System for the apps to start."""
+
+    def __init__(self, gpu):
+        self.gpu = gpu
+        self.battery = HostBattery()
+        self.kitty_gl = Kitty(gpu)
+        Font.cache.set_budget(KittyConf.glyph_cache_bytes)
+        self.status_document = Document(Position(0, 0, 480, 30), 'status_doc')
+        self.app_document = Document(Position(0, 30, 480, 290), 'app_doc')
+        self.status_bar = self.load_app(AppsConf.sys_directory, AppsConf.status_bar_app)
+        self.running_app = self.load_app(AppsConf.sys_directory, AppsConf.home_app)
+
+    def load_app(self, directory, name):
+        App = AppUtils.load('%s.%s' % (directory, name), 'App')
+        return App(self)
+
+    def get_installed_apps(self):
+        return AppUtils.list_apps(AppsConf.directory)
+
+    def get_app_document(self):
+        return self.app_document
+
+    def get_status_document(self):
+        return self.status_document
+
+    def draw(self):
+        self.status_document.draw(self.kitty_gl)
+        self.app_document.draw(self.kitty_gl)
+        self.kitty_gl.flush()
+
+
+def render(args, gpu, frame_stats = False):
+    """Draw args.frames frames and return the system, frame stats and frames.
+
+    Every frame is a tuple of wall and CPU seconds and the driver stats.
+    """
+    random.seed(args.seed)
+
+    # Element draws print their positions, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = HostSystem(gpu)
+
+    if args.display_list:
+        system.kitty_gl.enable_display_list()
+
+    if args.compositor:
+        system.kitty_gl.enable_compositor(KittyConf.compositor_tile_width, KittyConf.compositor_tile_height, KittyConf.compositor_bytes)
+
+    screen = system.status_bar.screen
+    frames = []
+    frame_stats = FrameStats(system.kitty_gl, args.frames, args.slow_ms) if frame_stats else None
+
+    for frame in range(args.frames):
+        if frame:
+            with contextlib.redirect_stdout(io.StringIO()):
+                screen.touch_clock((0, 0))
+
+        gpu.reset_stats()
+        start = time.perf_counter()
+        cpu = time.thread_time()
+
+        if frame_stats != None:
+            frame_stats.begin()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            system.draw()
+
+        if frame_stats != None:
+            frame_stats.end()
+
+        elapsed = time.perf_counter() - start
+        frames.append((elapsed, time.thread_time() - cpu, gpu.stats()))
+
+    return system, frame_stats, frames
+
+
+def overlap(args, Gpu):
+    """Compare blocking and overlapped transfers over a simulated bus."""
+    for backend in ('sync', 'thread'):
+        gpu = Gpu(DisplayConf.resolution, DisplayConf.rotation, backend, True)
+        frames = render(args, gpu)[2]
+        count = len(frames)
+
+        # The main thread's CPU time leaves out the simulated bus
+        print('{0}: {1:.1f} ms wall, {2:.1f} ms cpu, {3} us bus, {4} queue waits per frame'.format(
+            backend,
+            sum(f[0] for f in frames) * 1000 / count,
+            sum(f[1] for f in frames) * 1000 / count,
+            sum(f[2]['bus_us'] for f in frames) // count,
+            sum(f[2]['queue_waits'] for f in frames) // count))
+
+    return 0
+
+
+def run(args):
+    Gpu = DriverUtils.load('gpu', 'framebuffer', 'Gpu')
+
+    if args.overlap:
+        return overlap(args, Gpu)
+
+    gpu = Gpu(DisplayConf.resolution, DisplayConf.rotation)
+    system, frame_stats, frames = render(args, gpu, args.frame_stats)
+
+    first_time, _, first = frames[0]
+    print('first frame: {0:.1f} ms cpu, {1} us bus, {2} windows, {3} data bytes'.format(
+        first_time * 1000, first['bus_us'], first['windows'], first['data_bytes']))
+
+    if len(frames) > 1:
+        rest = frames[1:]
+        count = len(rest)
+        print('next {0} frames, average: {1:.1f} ms cpu, {2} us bus, {3} windows, {4} data bytes'.format(
+            count,
+            sum(f[0] for f in rest) * 1000 / count,
+            sum(f[2]['bus_us'] for f in rest) // count,
+            sum(f[2]['windows'] for f in rest) // count,
+            sum(f[2]['data_bytes'] for f in rest) // count))
+
+    if frame_stats != None:
+        print('frame stats, average: {0}'.format(frame_stats.summary()))
+
+    if args.dump:
+        if args.dump.endswith('.ppm'):
+            gpu.dump_ppm(args.dump)
+        else:
+            gpu.dump_png(args.dump)
+
+        print('Wrote last frame to {0}'.format(args.dump))
+
+    return 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--display-list', action='store_true')
+    parser.add_argument('--compositor', action='store_true')
+    parser.add_argument('--dump', help='PNG or PPM file for the last frame')
+    parser.add_argument('--frame-stats', action='store_true', help='Collect FrameStats and log slow frames')
+    parser.add_argument('--slow-ms', type=int, default=50)
+    parser.add_argument('--overlap', action='store_true', help='Compare blocking and threaded transfers over a simulated bus')
+
+    return run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))